@@ -0,0 +1,117 @@
+import math
+import random
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import cache
+from redis.exceptions import LockError
+
+CachedValue = namedtuple("CachedValue", ["value", "delta", "expires_at"])
+
+
+class LocalLRUCache:
+    """
+    Thread-safe per-worker LRU of at most ``maxsize`` entries, kept in front
+    of Redis. With a ``timeout`` entries also expire after that many seconds.
+    """
+
+    def __init__(self, maxsize, timeout=None):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.timeout is None:
+            expires_at = math.inf
+        else:
+            expires_at = time.monotonic() + self.timeout
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _should_refresh(entry, beta):
+    # probabilistic early expiration (XFetch): the closer the expiry and the
+    # slower the computation, the likelier a reader refreshes ahead of time
+    return (
+        time.time() - entry.delta * beta * math.log(1 - random.random())
+        >= entry.expires_at
+    )
+
+
+def _compute_and_set(key, compute, timeout, stale_timeout):
+    started = time.time()
+    value = compute()
+    now = time.time()
+    cache.set(
+        key, CachedValue(value, now - started, now + timeout), timeout + stale_timeout
+    )
+    return value
+
+
+def get_or_compute(
+    key, compute, timeout, *, stale_timeout=None, beta=1.0, lock_timeout=10
+):
+    """
+    Return the cached value of ``key``, calling ``compute`` as rarely as possible.
+
+    - Only the worker holding ``<key>_lock`` recomputes; the others wait for
+      its result when nothing is cached (single flight).
+    - Readers may refresh a value before it expires, more likely as the
+      expiry nears (probabilistic early refresh).
+    - An expired value is kept for ``stale_timeout`` more seconds (default:
+      ``timeout``) and served while one worker recomputes it.
+    """
+    stale_timeout = timeout if stale_timeout is None else stale_timeout
+    entry = cache.get(key)
+    if not isinstance(entry, CachedValue):
+        entry = None
+    elif not _should_refresh(entry, beta):
+        return entry.value
+
+    lock = cache.lock(f"{key}_lock", timeout=lock_timeout)
+    if entry is not None:
+        if not lock.acquire(blocking=False):
+            # another worker is refreshing it already
+            return entry.value
+    elif not lock.acquire(blocking=True, blocking_timeout=lock_timeout):
+        # the lock holder is stuck, do not wait for it any longer
+        return _compute_and_set(key, compute, timeout, stale_timeout)
+
+    try:
+        if entry is None:
+            # the previous lock holder has most likely filled it
+            entry = cache.get(key)
+            if isinstance(entry, CachedValue) and time.time() < entry.expires_at:
+                return entry.value
+        return _compute_and_set(key, compute, timeout, stale_timeout)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # the lock expired during a slow computation
+            pass
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class CustomersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'applications.customers'
+
+    def ready(self):
+        from .authentication import invalidate_customer
+
+        post_save.connect(invalidate_customer, sender="customers.WechatCostomer")
+        post_delete.connect(invalidate_customer, sender="customers.WechatCostomer")
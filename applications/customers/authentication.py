@@ -1,12 +1,63 @@
 import logging
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
 
+from applications.caching import LocalLRUCache
+
 from .models import WechatCostomer
 
 logger = logging.getLogger(__name__)
 
+# other workers only learn of a change once their copy expires, keep it short
+local_customers = LocalLRUCache(
+    settings.CUSTOMER_LOCAL_CACHE_SIZE, settings.CUSTOMER_LOCAL_CACHE_TIMEOUT
+)
+
+
+def _customer_key(customer_id):
+    return f"customer_{customer_id}"
+
+
+def get_customer(customer_id):
+    """
+    The customer a token belongs to, or None once it is deleted.
+
+    Looked up in this worker's LRU, then in Redis, then in the database; only
+    the field values are cached and a fresh instance is built for each request.
+    """
+    key = _customer_key(customer_id)
+    values = local_customers.get(key)
+    if values is None:
+        values = cache.get(key)
+        if values is None:
+            customer = WechatCostomer.objects.filter(id=customer_id).first()
+            if customer is None:
+                return None
+            values = {
+                field.attname: getattr(customer, field.attname)
+                for field in WechatCostomer._meta.concrete_fields
+            }
+            cache.set(key, values, settings.CUSTOMER_CACHE_TIMEOUT)
+        local_customers.set(key, values)
+    return WechatCostomer.from_db(
+        WechatCostomer.objects.db, list(values), list(values.values())
+    )
+
+
+def invalidate_customer(sender, instance, **kwargs):
+    """post_save/post_delete receiver dropping the cached copies of a customer."""
+    key = _customer_key(instance.pk)
+
+    def invalidate():
+        local_customers.delete(key)
+        cache.delete(key)
+
+    transaction.on_commit(invalidate)
+
 
 class CustomJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
@@ -23,11 +74,8 @@ class CustomJWTAuthentication(JWTAuthentication):
         return (user, validated_token)
 
     def get_user(self, validated_token):
-        try:
-            user_id = validated_token["user_id"]
-            user = WechatCostomer.objects.get(id=user_id)
-
-        except WechatCostomer.DoesNotExist:
+        user = get_customer(validated_token["user_id"])
+        if user is None:
             raise InvalidToken("User not found")
 
         return user
@@ -0,0 +1,138 @@
+import functools
+from datetime import datetime
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError, WatchError
+
+from applications.instrumentation import record_cache_lookup
+
+CART_TIMEOUT = 86400
+TIMESTAMP_SUFFIX = "|timestamp"
+
+# KEYS[1]: cart hash, ARGV: item, item timestamp field, timestamp, timeout
+DECREMENT_ITEM_SCRIPT = """
+if redis.call("HEXISTS", KEYS[1], ARGV[1]) == 0 then
+    return -1
+end
+local number = redis.call("HINCRBY", KEYS[1], ARGV[1], -1)
+if number <= 0 then
+    redis.call("HDEL", KEYS[1], ARGV[1], ARGV[2])
+else
+    redis.call("HSET", KEYS[1], ARGV[2], ARGV[3])
+end
+redis.call("EXPIRE", KEYS[1], ARGV[4])
+return number
+"""
+
+decrement_item = get_redis_connection("default").register_script(
+    DECREMENT_ITEM_SCRIPT
+)
+
+
+def _migrating_legacy_cart(method):
+    # carts written by earlier releases are pickled dicts under the same key,
+    # which every hash command rejects with WRONGTYPE
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except ResponseError as exc:
+            if "WRONGTYPE" not in str(exc):
+                raise
+        self._migrate_legacy_cart()
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class ShoppingCart:
+    """
+    Shopping cart of one customer, stored as a single Redis hash.
+
+    Every item (``dish_{id}``, ``dish_{id}_{flavor}`` or ``setmeal_{id}``) owns
+    two fields: its number and the time it was last changed. Increments and
+    decrements run server side, so concurrent taps never lose updates.
+    """
+
+    def __init__(self, user_id):
+        self.cache_key = f"cart_{user_id}"
+        self.key = cache.make_key(self.cache_key)
+        self.connection = get_redis_connection("default")
+
+    @_migrating_legacy_cart
+    def add(self, item_name):
+        pipeline = self.connection.pipeline()
+        pipeline.hincrby(self.key, item_name, 1)
+        pipeline.hset(
+            self.key, item_name + TIMESTAMP_SUFFIX, datetime.now().isoformat()
+        )
+        pipeline.expire(self.key, CART_TIMEOUT)
+        number, *_ = pipeline.execute()
+        return number
+
+    @_migrating_legacy_cart
+    def remove(self, item_name):
+        """Return the remaining number, or -1 if the item is not in the cart."""
+        return decrement_item(
+            keys=[self.key],
+            args=[
+                item_name,
+                item_name + TIMESTAMP_SUFFIX,
+                datetime.now().isoformat(),
+                CART_TIMEOUT,
+            ],
+        )
+
+    @_migrating_legacy_cart
+    def items(self):
+        raw_items = {
+            field.decode(): value.decode()
+            for field, value in self.connection.hgetall(self.key).items()
+        }
+        record_cache_lookup("cart", bool(raw_items))
+        return {
+            field: {
+                "number": int(value),
+                "timestamp": raw_items.get(field + TIMESTAMP_SUFFIX),
+            }
+            for field, value in raw_items.items()
+            if not field.endswith(TIMESTAMP_SUFFIX)
+        }
+
+    @_migrating_legacy_cart
+    def discard(self, item_names):
+        """Drop ``item_names`` whatever their number, keeping any other item."""
+        if item_names:
+            self.connection.hdel(
+                self.key,
+                *item_names,
+                *(item_name + TIMESTAMP_SUFFIX for item_name in item_names),
+            )
+
+    def clear(self):
+        self.connection.delete(self.key)
+
+    def _migrate_legacy_cart(self):
+        """Rewrite a cart pickled by an earlier release as a hash, in place."""
+        with self.connection.pipeline() as pipeline:
+            try:
+                pipeline.watch(self.key)
+                if pipeline.type(self.key) != b"string":
+                    return
+                legacy_items = cache.get(self.cache_key) or {}
+                pipeline.multi()
+                pipeline.delete(self.key)
+                for item_name, item in legacy_items.items():
+                    pipeline.hset(
+                        self.key,
+                        mapping={
+                            item_name: item["number"],
+                            item_name + TIMESTAMP_SUFFIX: item["timestamp"],
+                        },
+                    )
+                pipeline.expire(self.key, CART_TIMEOUT)
+                pipeline.execute()
+            except WatchError:
+                # another request migrated it first
+                pass
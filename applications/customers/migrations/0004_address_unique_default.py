@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:01
+
+from django.db import migrations, models
+
+
+def keep_latest_default(apps, schema_editor):
+    # earlier concurrent switches may have left several defaults
+    Address = apps.get_model('customers', 'Address')
+    latest = {}
+    for address_id, customer_id in (
+        Address.objects.filter(is_default=True).order_by('id').values_list('id', 'customer_id')
+    ):
+        latest[customer_id] = address_id
+    Address.objects.filter(is_default=True).exclude(id__in=latest.values()).update(is_default=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_rename_addressbook_address'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_default, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(models.Case(models.When(is_default=True, then=models.F('customer_id'))), name='unique_default_address'),
+        ),
+    ]
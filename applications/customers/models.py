@@ -36,5 +36,17 @@ class Address(models.Model):
     label = models.CharField(max_length=100, blank=True, null=True)
     is_default = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            # at most one default per customer; the others index as NULL, as
+            # MySQL ignores conditional unique constraints
+            models.UniqueConstraint(
+                models.Case(
+                    models.When(is_default=True, then=models.F("customer_id"))
+                ),
+                name="unique_default_address",
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"{self.province_name}{self.city_name}{self.district_name}{self.detail}"
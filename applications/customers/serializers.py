@@ -1,10 +1,9 @@
-import requests
-from django.conf import settings
 from rest_framework import serializers
 
 from applications.utils import to_camel_case, to_snake_case
 
 from .models import Address, WechatCostomer
+from .wechat import WechatError, wechat
 
 
 class AuthorizationWechatCostomerLoginSerializer(serializers.Serializer):
@@ -12,17 +11,11 @@ class AuthorizationWechatCostomerLoginSerializer(serializers.Serializer):
 
     def validate(self, attrs):
         auth_code = attrs.get("code")
-        app_id = settings.WECHAT_APPID
-        app_secret = settings.WECHAT_SECRET_KEY
-        wechat_url = f"https://api.weixin.qq.com/sns/jscode2session?appid={app_id}&secret={app_secret}&js_code={auth_code}&grant_type=authorization_code"
-        response = requests.get(wechat_url)
-        if response.status_code != 200:
-            raise serializers.ValidationError("Failed to authenticate with WeChat")
-        wechat_data = response.json()
-        if "errcode" in wechat_data:
-            raise serializers.ValidationError(wechat_data["errmsg"])
-        open_id = wechat_data["openid"]
-        user, created = WechatCostomer.objects.get_or_create(openid=open_id)
+        try:
+            open_id = wechat.code2session(auth_code)
+        except WechatError as exc:
+            raise serializers.ValidationError(exc.errmsg)
+        user, _ = WechatCostomer.objects.get_or_create(openid=open_id)
 
         attrs["user"] = user
 
@@ -1,3 +1,349 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from applications.file_upload.models import UploadedImage
+from applications.meals.models import Category, Dish, Setmeal
+
+from .authentication import CustomJWTAuthentication, local_customers
+from .cart import ShoppingCart
+from .models import Address, WechatCostomer
+from .views import (
+    AuthorizationWechatCostomerLoginView,
+    DefaultAddressView,
+    ShoppingCartAddView,
+    ShoppingCartAllView,
+    ShoppingCartRemoveView,
+)
+from .wechat import wechat
 
 # Create your tests here.
+
+
+class ShoppingCartViewTests(APITestCase):
+
+    def setUp(self):
+        self.customer = WechatCostomer.objects.create(
+            openid="test_shopping_cart", name="test_shopping_cart"
+        )
+        self.cart = ShoppingCart(self.customer.id)
+        self.factory = APIRequestFactory()
+        self.add_url = reverse("add_to_shopping_cart")
+        self.remove_url = reverse("remove_shopping_cart")
+
+    def tearDown(self):
+        self.cart.clear()
+
+    def post(self, view, url, data):
+        request = self.factory.post(url, data, format="json")
+        force_authenticate(request, user=self.customer)
+        return view.as_view()(request)
+
+    def test_add_and_remove_items(self):
+        for _ in range(3):
+            self.post(ShoppingCartAddView, self.add_url, {"dishId": 1})
+        self.post(
+            ShoppingCartAddView, self.add_url, {"dishId": 2, "dishFlavor": "辣"}
+        )
+        self.post(ShoppingCartAddView, self.add_url, {"setmealId": 1})
+        response = self.post(ShoppingCartRemoveView, self.remove_url, {"dishId": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.post(ShoppingCartRemoveView, self.remove_url, {"setmealId": 1})
+
+        items = self.cart.items()
+        self.assertEqual(list(items), ["dish_1", "dish_2_辣"])
+        self.assertEqual(items["dish_1"]["number"], 2)
+        self.assertEqual(items["dish_2_辣"]["number"], 1)
+        self.assertIsNotNone(items["dish_1"]["timestamp"])
+
+    def test_legacy_pickled_cart_is_migrated_on_read(self):
+        cache.set(
+            f"cart_{self.customer.id}",
+            {"dish_1": {"number": 2, "timestamp": "2024-05-01T12:00:00"}},
+            timeout=86400,
+        )
+        self.assertEqual(
+            self.cart.items(),
+            {"dish_1": {"number": 2, "timestamp": "2024-05-01T12:00:00"}},
+        )
+        self.assertEqual(self.cart.add("dish_1"), 3)
+
+        cache.set(f"cart_{self.customer.id}", {}, timeout=86400)
+        self.assertEqual(self.cart.remove("dish_1"), -1)
+        self.assertEqual(self.cart.add("setmeal_1"), 1)
+
+    def test_remove_missing_item(self):
+        self.assertEqual(self.cart.remove("dish_1"), -1)
+        self.assertEqual(self.cart.items(), {})
+        with self.assertRaises(Exception):
+            self.post(ShoppingCartRemoveView, self.remove_url, {"dishId": 1})
+
+    def test_list_items_in_constant_queries(self):
+        image = UploadedImage.objects.create(file="images/test.png")
+        category = Category.objects.create(name="test_category", type=1, sort=1)
+        dishes = [
+            Dish.objects.create(
+                name=f"test_dish_{i}",
+                category_id=category,
+                price=10 + i,
+                image=image,
+                description="",
+            )
+            for i in range(5)
+        ]
+        setmeal = Setmeal.objects.create(
+            name="test_setmeal",
+            category_id=category,
+            price=30,
+            image=image,
+            description="",
+        )
+        for dish in dishes:
+            self.cart.add(f"dish_{dish.id}")
+        self.cart.add(f"dish_{dishes[0].id}_辣")
+        self.cart.add(f"setmeal_{setmeal.id}")
+
+        request = self.factory.get(reverse("query_shopping_cart_data"))
+        force_authenticate(request, user=self.customer)
+        with self.assertNumQueries(2):
+            response = ShoppingCartAllView.as_view()(request)
+
+        records = response.data["data"]
+        self.assertEqual(len(records), 7)
+        self.assertEqual(
+            list(records[5]),
+            ["number", "createTime", "dishId", "dish_flavor", "image", "name", "amount"],
+        )
+        self.assertEqual(records[5]["name"], dishes[0].name)
+        self.assertEqual(records[6]["setmeal_id"], str(setmeal.id))
+        self.assertEqual(records[6]["image"], "/media/images/test.png")
+
+
+class WechatStubHandler(BaseHTTPRequestHandler):
+    # keep-alive, like api.weixin.qq.com
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(parse_qs(urlparse(self.path).query))
+        server.connections.add(self.client_address)
+        status_code, body, delay = (
+            server.replies.pop(0) if server.replies else (200, None, 0)
+        )
+        time.sleep(delay)
+        if body is None:
+            code = server.requests[-1]["js_code"][0]
+            body = {"openid": f"openid_{code}", "session_key": "key"}
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WechatClientTests(APITestCase):
+    """Logins against a local stand-in for the WeChat code2session API."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), WechatStubHandler)
+        self.server.daemon_threads = True
+        self.server.requests, self.server.connections, self.server.replies = (
+            [],
+            set(),
+            [],
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        settings_override = override_settings(
+            WECHAT_API_URL=f"http://127.0.0.1:{self.server.server_port}"
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.factory = APIRequestFactory()
+
+    def login(self, code):
+        request = self.factory.post(reverse("costomer_login"), {"code": code})
+        return AuthorizationWechatCostomerLoginView.as_view()(request)
+
+    def test_login_reuses_pooled_connection(self):
+        for code in ("code_a", "code_b"):
+            response = self.login(code)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["data"]["openid"], f"openid_{code}")
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_duplicate_submit_is_answered_from_cache(self):
+        first = self.login("code_duplicate")
+        second = self.login("code_duplicate")
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["data"]["id"], second.data["data"]["id"])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_invalid_code_is_rejected(self):
+        self.server.replies.append(
+            (200, {"errcode": 40029, "errmsg": "invalid code"}, 0)
+        )
+        response = self.login("code_invalid")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["non_field_errors"][0], "invalid code")
+        self.assertFalse(WechatCostomer.objects.exists())
+
+    def test_server_errors_are_retried(self):
+        self.server.replies.append((503, {}, 0))
+        response = self.login("code_retried")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.server.requests), 2)
+
+    @override_settings(WECHAT_API_TIMEOUT=(1, 0.2))
+    def test_slow_wechat_fails_fast(self):
+        self.server.replies.append((200, None, 1))
+        started = time.perf_counter()
+        response = self.login("code_slow")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertLess(time.perf_counter() - started, 1)
+        # a read that timed out is never retried, WeChat may have used the code
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_busy_wechat_is_unavailable(self):
+        self.server.replies.append((200, {"errcode": -1, "errmsg": "busy"}, 0))
+        response = self.login("code_busy")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_async_code2session(self):
+        openid = async_to_sync(wechat.acode2session)("code_async")
+        self.assertEqual(openid, "openid_code_async")
+
+
+class CustomJWTAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        self.customer = WechatCostomer.objects.create(
+            openid="test_jwt_auth", name="before"
+        )
+        self.key = f"customer_{self.customer.id}"
+        self.clear_cached_customer()
+        self.addCleanup(self.clear_cached_customer)
+        self.token = str(RefreshToken.for_user(self.customer).access_token)
+
+    def clear_cached_customer(self):
+        local_customers.clear()
+        cache.delete(self.key)
+
+    def authenticate(self):
+        request = APIRequestFactory().get(
+            "/user/shoppingCart/list", headers={"authentication": self.token}
+        )
+        result = CustomJWTAuthentication().authenticate(request)
+        return result and result[0]
+
+    def test_customer_is_cached_per_worker_then_in_redis(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate(), self.customer)
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user.name, "before")
+        self.assertEqual(user.create_time, self.customer.create_time)
+
+        local_customers.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().openid, "test_jwt_auth")
+
+    def test_changed_customer_is_invalidated(self):
+        self.authenticate()
+        self.customer.name = "after"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.save()
+        self.assertEqual(self.authenticate().name, "after")
+
+    def test_deleted_customer_is_rejected(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.delete()
+        self.assertIsNone(self.authenticate())
+
+
+class DefaultAddressViewTests(APITestCase):
+
+    def setUp(self):
+        self.customer = WechatCostomer.objects.create(
+            openid="test_default_address", name="test_default_address"
+        )
+        self.home, self.office = [
+            Address.objects.create(
+                customer_id=self.customer,
+                consignee=self.customer.name,
+                phone="13800000000",
+                province_code="11",
+                province_name="北京市",
+                city_code="1101",
+                city_name="市辖区",
+                district_code="110101",
+                district_name="东城区",
+                detail=detail,
+                is_default=detail == "home",
+            )
+            for detail in ("home", "office")
+        ]
+        self.factory = APIRequestFactory()
+        self.url = reverse("query_dafault_address")
+        cache.delete(f"default_address_{self.customer.id}")
+
+    def get_default(self):
+        request = self.factory.get(self.url)
+        force_authenticate(request, user=self.customer)
+        return DefaultAddressView.as_view()(request).data["data"]
+
+    def set_default(self, address_id):
+        request = self.factory.put(self.url, {"id": address_id}, format="json")
+        force_authenticate(request, user=self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            return DefaultAddressView.as_view()(request)
+
+    def test_get_default_in_one_query_then_from_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_default()["detail"], "home")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_default()["detail"], "home")
+
+    def test_switch_default(self):
+        self.get_default()
+        response = self.set_default(self.office.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(
+                Address.objects.filter(customer_id=self.customer, is_default=True)
+            ),
+            [self.office],
+        )
+        self.assertEqual(self.get_default()["detail"], "office")
+
+    def test_switch_to_unknown_address_keeps_default(self):
+        stranger = WechatCostomer.objects.create(openid="test_default_stranger")
+        address = Address.objects.create(
+            customer_id=stranger, consignee="stranger", phone="13800000001", detail=""
+        )
+        response = self.set_default(address.id)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.home.refresh_from_db()
+        self.assertTrue(self.home.is_default)
+
+    def test_one_default_per_customer(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Address.objects.filter(id=self.office.id).update(is_default=True)
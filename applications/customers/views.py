@@ -1,15 +1,16 @@
 import logging
-from datetime import datetime
 
 from django.core.cache import cache
+from django.db import transaction
 from rest_framework import permissions
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from applications.exceptions import KeyMissingException
+from applications.exceptions import AddressNotFoundException, KeyMissingException
 from applications.meals.models import Dish, Setmeal
 from applications.utils import standard_response
 
+from .cart import ShoppingCart
 from .models import Address
 from .serializers import (
     AddressBookCreationSerializer,
@@ -20,6 +21,23 @@ from .serializers import (
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_ADDRESS_TIMEOUT = 3600
+
+
+def _default_address_key(customer_id):
+    return f"default_address_{customer_id}"
+
+
+def invalidate_default_address(customer_id):
+    transaction.on_commit(lambda: cache.delete(_default_address_key(customer_id)))
+
+
+def clear_default_address(customer_id, keep_id=None):
+    """Unset the customer's current default, so another address can take it."""
+    Address.objects.filter(customer_id=customer_id, is_default=True).exclude(
+        id=keep_id
+    ).update(is_default=False)
+
 
 class AuthorizationWechatCostomerLoginView(APIView):
 
@@ -47,9 +65,13 @@ class AddressView(APIView):
         serializer = AddressBookCreationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         validated_data = serializer.validated_data
-        create_address = Address.objects.create(
-            customer_id=request.user, **validated_data
-        )
+        with transaction.atomic():
+            if validated_data.get("is_default"):
+                clear_default_address(request.user.id)
+                invalidate_default_address(request.user.id)
+            create_address = Address.objects.create(
+                customer_id=request.user, **validated_data
+            )
         response_data = AddressBookRepresentationSerializer(create_address).data
         return standard_response(
             True, "AddressBook created successfully", response_data
@@ -62,7 +84,13 @@ class AddressView(APIView):
         updata_address = Address.objects.get(id=validated_data["id"])
         for key, value in validated_data.items():
             setattr(updata_address, key, value)
-        updata_address.save()
+        with transaction.atomic():
+            if updata_address.is_default:
+                clear_default_address(
+                    updata_address.customer_id_id, keep_id=updata_address.id
+                )
+            updata_address.save()
+        invalidate_default_address(updata_address.customer_id_id)
         response_data = AddressBookRepresentationSerializer(updata_address).data
         return standard_response(
             True, "AddressBook updated successfully", response_data
@@ -76,6 +104,8 @@ class AddressView(APIView):
 
         address = Address.objects.get(id=_id)
         address.delete()
+        if address.is_default:
+            invalidate_default_address(address.customer_id_id)
         return standard_response(True, "AddressBook deleted successfully", {})
 
 
@@ -106,17 +136,18 @@ class DefaultAddressView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        default_address_set = Address.objects.filter(
-            customer_id=request.user, is_default=True
-        )
-        default_address = (
-            default_address_set.first() if default_address_set.exists() else None
-        )
-        response_data = (
-            AddressBookRepresentationSerializer(default_address).data
-            if default_address
-            else {}
-        )
+        key = _default_address_key(request.user.id)
+        response_data = cache.get(key)
+        if response_data is None:
+            default_address = Address.objects.filter(
+                customer_id=request.user, is_default=True
+            ).first()
+            response_data = (
+                AddressBookRepresentationSerializer(default_address).data
+                if default_address
+                else {}
+            )
+            cache.set(key, response_data, DEFAULT_ADDRESS_TIMEOUT)
         return standard_response(
             True, "Get default address successfully", response_data
         )
@@ -126,18 +157,14 @@ class DefaultAddressView(APIView):
         if not _id:
             raise KeyMissingException(key_name="id", position="request body")
 
-        default_address_set = Address.objects.filter(
-            customer_id=request.user, is_default=True
-        )
-        original_default_address = (
-            default_address_set.first() if default_address_set.exists() else None
-        )
-        curr_default_address = Address.objects.get(id=_id)
-        curr_default_address.is_default = True
-        curr_default_address.save()
-        if original_default_address:
-            original_default_address.is_default = False
-            original_default_address.save()
+        # clear first, the constraint is checked after each statement
+        with transaction.atomic():
+            clear_default_address(request.user.id, keep_id=_id)
+            if not Address.objects.filter(id=_id, customer_id=request.user).update(
+                is_default=True
+            ):
+                raise AddressNotFoundException()
+            invalidate_default_address(request.user.id)
         return standard_response(True, "Set default address successfully", {})
 
 
@@ -145,10 +172,9 @@ class ShoppingCartAllView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        user_id = self.request.user.id
-        cache_key = f"cart_{user_id}"
-        cart_data = cache.get(cache_key, {})
+        cart_data = ShoppingCart(self.request.user.id).items()
         res = []
+        dish_items, setmeal_items = [], []
         for key, value in cart_data.items():
             shopping_cart_item = {}
             shopping_cart_item["number"] = value["number"]
@@ -157,25 +183,29 @@ class ShoppingCartAllView(APIView):
                 case ["dish", dish_id, dish_flavor]:
                     shopping_cart_item["dishId"] = dish_id
                     shopping_cart_item["dish_flavor"] = dish_flavor
-                    dish_obj = Dish.objects.get(id=dish_id)
-                    shopping_cart_item["image"] = dish_obj.image.file.url
-                    shopping_cart_item["name"] = dish_obj.name
-                    shopping_cart_item["amount"] = dish_obj.price
+                    dish_items.append((int(dish_id), shopping_cart_item))
                 case ["dish", dish_id]:
                     shopping_cart_item["dishId"] = dish_id
-                    dish_obj = Dish.objects.get(id=dish_id)
-                    shopping_cart_item["image"] = dish_obj.image.file.url
-                    shopping_cart_item["name"] = dish_obj.name
-                    shopping_cart_item["amount"] = dish_obj.price
+                    dish_items.append((int(dish_id), shopping_cart_item))
                 case ["setmeal", setmeal_id]:
                     shopping_cart_item["setmeal_id"] = setmeal_id
-                    setmeal_obj = Setmeal.objects.get(id=setmeal_id)
-                    shopping_cart_item["image"] = setmeal_obj.image.file.url
-                    shopping_cart_item["name"] = setmeal_obj.name
-                    shopping_cart_item["amount"] = setmeal_obj.price
+                    setmeal_items.append((int(setmeal_id), shopping_cart_item))
                 case _:
                     raise Exception("idk")
             res.append(shopping_cart_item)
+
+        for model, items in ((Dish, dish_items), (Setmeal, setmeal_items)):
+            objs = model.objects.select_related("image").in_bulk(
+                [_id for _id, _ in items]
+            )
+            for _id, shopping_cart_item in items:
+                if _id not in objs:
+                    raise model.DoesNotExist(
+                        f"{model.__name__} (id = {_id}) does not exist."
+                    )
+                shopping_cart_item["image"] = objs[_id].image.file.url
+                shopping_cart_item["name"] = objs[_id].name
+                shopping_cart_item["amount"] = objs[_id].price
         return standard_response(True, "Get shopping cart data successfully", res)
 
 
@@ -183,10 +213,7 @@ class ShoppingCartAddView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        user_id = self.request.user.id
         data = self.request.data
-        cache_key = f"cart_{user_id}"
-        cart_data = cache.get(cache_key, {})
 
         match data:
             case {"dishId": dish_id, "dishFlavor": dish_flavor}:
@@ -202,15 +229,7 @@ class ShoppingCartAddView(APIView):
                     key_name="dishId or setmealId", position="request body"
                 )
 
-        if item_name in cart_data:
-            cart_data[item_name]["number"] += 1
-        else:
-            cart_data[item_name] = {
-                "number": 1,
-            }
-
-        cart_data[item_name]["timestamp"] = datetime.now().isoformat()
-        cache.set(cache_key, cart_data, timeout=86400)
+        ShoppingCart(self.request.user.id).add(item_name)
 
         return standard_response(True, "Add to shopping cart successfully", {})
 
@@ -219,10 +238,7 @@ class ShoppingCartRemoveView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        user_id = self.request.user.id
         data = self.request.data
-        cache_key = f"cart_{user_id}"
-        cart_data = cache.get(cache_key, {})
 
         match data:
             case {"dishId": dish_id, "dishFlavor": dish_flavor}:
@@ -236,17 +252,9 @@ class ShoppingCartRemoveView(APIView):
                     key_name="dishId or setmealId", position="request body"
                 )
 
-        if item_id not in cart_data or cart_data[item_id]["number"] == 0:
+        if ShoppingCart(self.request.user.id).remove(item_id) < 0:
             raise Exception("Item not in shopping cart")
 
-        if cart_data[item_id]["number"] == 1:
-            del cart_data[item_id]
-        else:
-            cart_data[item_id]["number"] -= 1
-            cart_data[item_id]["timestamp"] = datetime.now().isoformat()
-
-        cache.set(cache_key, cart_data, timeout=86400)
-
         return standard_response(True, "Remove from shopping cart successfully", {})
 
 
@@ -254,8 +262,6 @@ class ShoppingCartCleanView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def delete(self, request, *args, **kwargs):
-        user_id = self.request.user.id
-        cache_key = f"cart_{user_id}"
-        cache.delete(cache_key)
+        ShoppingCart(self.request.user.id).clear()
 
         return standard_response(True, "Clean shopping cart successfully", {})
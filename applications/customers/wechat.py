@@ -0,0 +1,107 @@
+import hashlib
+import logging
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from applications.caching import get_or_compute
+from applications.exceptions import WechatUnavailableException
+
+logger = logging.getLogger(__name__)
+
+# WeChat answers 200 with errcode -1 when it is overloaded
+SYSTEM_BUSY_ERRCODE = -1
+
+
+class WechatError(Exception):
+    """An error WeChat answered with, such as an invalid or already used code."""
+
+    def __init__(self, errcode, errmsg):
+        super().__init__(errmsg)
+        self.errcode = errcode
+        self.errmsg = errmsg
+
+
+class WechatClient:
+    """
+    WeChat mini program API client sharing one keep-alive connection pool.
+
+    Every call is bounded by ``WECHAT_API_TIMEOUT``; failed connections and
+    5xx answers are retried up to ``WECHAT_API_RETRIES`` times with backoff.
+    Timed-out reads are not retried, as WeChat may already have used the code.
+    """
+
+    def __init__(self, pool_size=10, retries=None):
+        retries = settings.WECHAT_API_RETRIES if retries is None else retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                connect=retries,
+                read=0,
+                status=retries,
+                backoff_factor=0.1,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset({"GET"}),
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def code2session(self, code):
+        """
+        Return the openid a login ``code`` belongs to.
+
+        Codes are single use, so the openid is cached for
+        ``WECHAT_SESSION_CACHE_TIMEOUT`` seconds and a resubmitted code gets
+        the first answer instead of a "code been used" error.
+        """
+        # numeric digest, so metrics group every key as "wechat_session"
+        digest = int(hashlib.sha256(code.encode()).hexdigest()[:24], 16)
+        return get_or_compute(
+            f"wechat_session_{digest}",
+            lambda: self._fetch_openid(code),
+            settings.WECHAT_SESSION_CACHE_TIMEOUT,
+            stale_timeout=0,
+            # never refresh early, the code cannot be exchanged twice
+            beta=0,
+        )
+
+    async def acode2session(self, code):
+        return await sync_to_async(self.code2session, thread_sensitive=False)(code)
+
+    def _fetch_openid(self, code):
+        try:
+            response = self.session.get(
+                f"{settings.WECHAT_API_URL}/sns/jscode2session",
+                params={
+                    "appid": settings.WECHAT_APPID,
+                    "secret": settings.WECHAT_SECRET_KEY,
+                    "js_code": code,
+                    "grant_type": "authorization_code",
+                },
+                timeout=settings.WECHAT_API_TIMEOUT,
+            )
+            response.raise_for_status()
+            data = response.json()
+        except requests.RequestException as exc:
+            # not the exception itself, its message holds the URL with the secret
+            logger.warning("WeChat code2session failed: %s", type(exc).__name__)
+            raise WechatUnavailableException()
+
+        errcode = data.get("errcode", 0)
+        if errcode == SYSTEM_BUSY_ERRCODE:
+            logger.warning("WeChat code2session busy: %s", data.get("errmsg"))
+            raise WechatUnavailableException()
+        if errcode:
+            raise WechatError(errcode, data.get("errmsg", ""))
+        return data["openid"]
+
+
+wechat = WechatClient()
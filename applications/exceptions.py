@@ -14,6 +14,42 @@ class StatusNotRightException(APIException):
     default_code = "status_not_right"
 
 
+class InvalidDateRangeException(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Date range is NOT correct, use YYYY-MM-DD and begin <= end."
+    default_code = "invalid_date_range"
+
+
+class InvalidFileTypeException(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "File type is NOT supported, use csv or xlsx."
+    default_code = "invalid_file_type"
+
+
+class InvalidCursorException(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Invalid pagination cursor."
+    default_code = "invalid_cursor"
+
+
+class OrderNotFoundException(APIException):
+    status_code = status.HTTP_404_NOT_FOUND
+    default_detail = "Order not found."
+    default_code = "order_not_found"
+
+
+class AddressNotFoundException(APIException):
+    status_code = status.HTTP_404_NOT_FOUND
+    default_detail = "Address not found."
+    default_code = "address_not_found"
+
+
+class WechatUnavailableException(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "WeChat login is temporarily unavailable, try again later."
+    default_code = "wechat_unavailable"
+
+
 class KeyMissingException(APIException):
     status_code = status.HTTP_400_BAD_REQUEST
     default_detail = "Missing key."
@@ -25,3 +61,21 @@ class KeyMissingException(APIException):
         else:
             self.detail = self.default_detail
         self.code = code if code else self.default_code
+
+
+class OrderStatusConflictException(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Order status does not allow this operation."
+    default_code = "order_status_conflict"
+
+
+class EmptyCartException(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Shopping cart is empty."
+    default_code = "empty_cart"
+
+
+class ItemUnavailableException(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Some items of this order are no longer available."
+    default_code = "item_unavailable"
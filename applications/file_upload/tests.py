@@ -1,8 +1,10 @@
 import logging
+import tempfile
 from io import BytesIO
 
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from django.urls import reverse
 from PIL import Image
 from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
@@ -40,7 +42,10 @@ class FileUploadTestCase(APITestCase):
 
         request = self.factory.post(self.url, {"file": file})
         force_authenticate(request, self.user)
-        response = self.view(request)
+        # keep the uploaded file out of the project's media directory
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                response = self.view(request)
         logging.debug(f"msg: {response.data.get("msg", "")}")
         self.assertEqual(response.status_code, 201)
 
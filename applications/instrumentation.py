@@ -0,0 +1,286 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django_redis import get_redis_connection
+from django_redis.client import DefaultClient
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+# name: (type, help)
+METRICS = {
+    "http_requests_total": ("counter", "Requests by URL name, method and status."),
+    "http_request_duration_seconds": ("histogram", "Request latency by URL name."),
+    "http_request_db_seconds": ("histogram", "Time spent in SQL by URL name."),
+    "http_request_queries": ("histogram", "SQL statements per request by URL name."),
+    "cache_requests_total": ("counter", "Cache lookups by key group and result."),
+    "order_transitions_total": ("counter", "Order status changes by source/target."),
+}
+METRICS_KEY = "metrics"
+
+_current_metrics = ContextVar("request_metrics", default=None)
+_MISSING = object()
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    return f"{name}{{{pairs}}}"
+
+
+def _histogram_series(name, labels, value, buckets):
+    """The cumulative bucket, sum and count increments of one observation."""
+    # every bucket is written, so all of them exist from the first observation
+    increments = [
+        (_series(f"{name}_bucket", {**labels, "le": bucket}), int(value <= bucket))
+        for bucket in buckets
+    ]
+    increments.append((_series(f"{name}_bucket", {**labels, "le": "+Inf"}), 1))
+    increments.append((_series(f"{name}_sum", labels), value))
+    increments.append((_series(f"{name}_count", labels), 1))
+    return increments
+
+
+class MetricsRegistry:
+    """
+    Process-local metric deltas, flushed into one Redis hash for all workers.
+
+    Recording only adds to a dict under a lock held for a few additions; a
+    daemon thread swaps the dict out every ``METRICS_FLUSH_INTERVAL`` seconds
+    and applies it with a single HINCRBYFLOAT pipeline.
+    """
+
+    def __init__(self):
+        self._deltas = defaultdict(float)
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def add(self, increments):
+        with self._lock:
+            for series, value in increments:
+                self._deltas[series] += value
+        if self._flusher is None:
+            self._start_flusher()
+
+    def increment(self, name, labels=None, value=1):
+        self.add([(_series(name, labels), value)])
+
+    def flush(self):
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(float)
+        if not deltas:
+            return
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        for series, value in deltas.items():
+            pipeline.hincrbyfloat(_metrics_key(), series, value)
+        try:
+            pipeline.execute()
+        except Exception:
+            # keep the deltas for the next flush
+            self.add(deltas.items())
+            raise
+
+    def collect(self):
+        """Return every series of every worker, including this one's pending deltas."""
+        self.flush()
+        raw_series = get_redis_connection("default").hgetall(_metrics_key())
+        return {series.decode(): float(value) for series, value in raw_series.items()}
+
+    def clear(self):
+        with self._lock:
+            self._deltas.clear()
+        get_redis_connection("default").delete(_metrics_key())
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_forever, name="metrics-flush", daemon=True
+                )
+                self._flusher.start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush metrics")
+
+
+def _metrics_key():
+    return cache.make_key(METRICS_KEY)
+
+
+metrics = MetricsRegistry()
+
+
+def get_cache_group(key):
+    """``cart_3``, ``menu_snapshot_17_dish_list_2`` -> ``cart``, ``menu_snapshot``."""
+    return re.split(r"_\d", str(key), maxsplit=1)[0]
+
+
+def record_cache_lookup(group, hit):
+    metrics.increment(
+        "cache_requests_total", {"group": group, "result": "hit" if hit else "miss"}
+    )
+    if request_metrics := _current_metrics.get():
+        if hit:
+            request_metrics.cache_hits += 1
+        else:
+            request_metrics.cache_misses += 1
+
+
+def record_order_transition(source, target, count):
+    metrics.increment(
+        "order_transitions_total", {"source": source, "target": target}, count
+    )
+
+
+class RequestMetrics:
+    """What a single request spent, filled in while it runs."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.latency = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # database execute wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class InstrumentedRedisClient(DefaultClient):
+    """django_redis client recording the hits and misses of cache lookups."""
+
+    def get(self, key, default=None, version=None, client=None):
+        value = super().get(key, default=_MISSING, version=version, client=client)
+        record_cache_lookup(get_cache_group(key), value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None, client=None):
+        values = super().get_many(keys, version=version, client=client)
+        for key in keys:
+            record_cache_lookup(get_cache_group(key), key in values)
+        return values
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB time, cache hits/misses and latency per URL name.
+
+    Only a ``REQUEST_METRICS_SAMPLE_RATE`` share of requests is measured.
+    With ``REQUEST_METRICS_HEADERS`` (on in debug) the figures of a measured
+    request are also returned as ``X-*`` response headers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        request_metrics = RequestMetrics()
+        token = _current_metrics.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(request_metrics))
+                response = self.get_response(request)
+        finally:
+            request_metrics.latency = time.perf_counter() - started
+            _current_metrics.reset(token)
+
+        match = request.resolver_match
+        view = {"view": match.url_name if match else "unresolved"}
+        request_labels = {
+            **view,
+            "method": request.method,
+            "status": response.status_code,
+        }
+        metrics.add(
+            [
+                (_series("http_requests_total", request_labels), 1),
+                *_histogram_series(
+                    "http_request_duration_seconds",
+                    view,
+                    request_metrics.latency,
+                    LATENCY_BUCKETS,
+                ),
+                *_histogram_series(
+                    "http_request_db_seconds",
+                    view,
+                    request_metrics.db_time,
+                    LATENCY_BUCKETS,
+                ),
+                *_histogram_series(
+                    "http_request_queries",
+                    view,
+                    request_metrics.queries,
+                    QUERY_COUNT_BUCKETS,
+                ),
+            ]
+        )
+        if settings.REQUEST_METRICS_HEADERS:
+            response["X-Query-Count"] = request_metrics.queries
+            response["X-DB-Time-Ms"] = f"{request_metrics.db_time * 1000:.2f}"
+            response["X-Cache-Hits"] = request_metrics.cache_hits
+            response["X-Cache-Misses"] = request_metrics.cache_misses
+            response["X-Response-Time-Ms"] = f"{request_metrics.latency * 1000:.2f}"
+        return response
+
+
+def _series_sort_key(series):
+    name, _, labels = series.partition("{")
+    le = re.search(r'le="([^"]+)"', labels)
+    bucket = float(le.group(1)) if le else 0
+    return name, re.sub(r',?le="[^"]+"', "", labels), bucket
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the metrics of all workers."""
+    if (
+        request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS
+        and not request.user.is_staff
+    ):
+        return HttpResponseForbidden()
+    families = defaultdict(list)
+    for series, value in metrics.collect().items():
+        name = series.partition("{")[0]
+        family = re.sub(r"_(bucket|sum|count)$", "", name)
+        families[family if family in METRICS else name].append((series, value))
+
+    lines = []
+    for family in sorted(families):
+        metric_type, help_text = METRICS.get(family, ("untyped", ""))
+        lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {metric_type}")
+        for series, value in sorted(
+            families[family], key=lambda item: _series_sort_key(item[0])
+        ):
+            lines.append(f"{series} {value}")
+    return HttpResponse(
+        "\n".join(lines) + "\n", content_type="text/plain; version=0.0.4"
+    )
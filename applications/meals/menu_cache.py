@@ -0,0 +1,44 @@
+import time
+
+from django.core.cache import cache
+
+from applications.caching import LocalLRUCache, get_or_compute
+
+MENU_VERSION_KEY = "menu_version"
+MENU_SNAPSHOT_TIMEOUT = 86400
+LOCAL_SNAPSHOT_SIZE = 256
+
+local_snapshots = LocalLRUCache(LOCAL_SNAPSHOT_SIZE)
+
+
+def get_menu_version():
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        # Start from the current time so a flushed Redis never brings back a
+        # version number that a worker still holds snapshots for.
+        cache.add(MENU_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+def bump_menu_version():
+    get_menu_version()
+    return cache.incr(MENU_VERSION_KEY)
+
+
+def get_menu_snapshot(name, build):
+    """
+    Return the snapshot called ``name`` for the current menu version.
+
+    ``build`` is only called, by one worker at a time, when neither this
+    worker nor Redis holds the snapshot yet; its result must be picklable.
+    """
+    key = f"menu_snapshot_{get_menu_version()}_{name}"
+    snapshot = local_snapshots.get(key)
+    if snapshot is not None:
+        return snapshot
+
+    # a version bump makes every worker miss at once; only one of them builds
+    snapshot = get_or_compute(key, build, MENU_SNAPSHOT_TIMEOUT)
+    local_snapshots.set(key, snapshot)
+    return snapshot
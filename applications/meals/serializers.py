@@ -82,6 +82,12 @@ class DishRepresentationSerializer(serializers.ModelSerializer):
             "update_time",
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("category_id", "image").prefetch_related(
+            "dishflavor_set"
+        )
+
     def get_image(self, obj):
         return obj.image.file.url
 
@@ -190,6 +196,12 @@ class SetmealRepresentationSerializer(serializers.ModelSerializer):
             "setmeal_dishes",
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related("category_id", "image").prefetch_related(
+            "setmealdish_set"
+        )
+
     def get_image(self, obj):
         return obj.image.file.url
 
@@ -1,3 +1,235 @@
-# from django.test import TestCase
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from applications.caching import CachedValue, LocalLRUCache, get_or_compute
+from applications.file_upload.models import UploadedImage
+
+from .menu_cache import bump_menu_version, local_snapshots
+from .models import Category, Dish, DishFlavor, Setmeal, SetmealDish
+from .views import (
+    ChangeDishStatusView,
+    PaginationDishView,
+    PaginationSetmealView,
+    QueryDishByCategoryView,
+    QuerySetmealByCategoryView,
+)
 
 # Create your tests here.
+
+
+class MenuSnapshotCacheTests(APITestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="test_menu_cache",
+            password="testpass123",
+            name="test_menu_cache",
+            phone="12345678901",
+            sex="1",
+            id_number="123456789012345678",
+            status=1,
+        )
+        image = UploadedImage.objects.create(file="images/test.png")
+        self.category = Category.objects.create(name="test_category", type=1, sort=1)
+        self.dish = Dish.objects.create(
+            name="test_dish",
+            category_id=self.category,
+            price=10,
+            image=image,
+            description="",
+        )
+        bump_menu_version()
+        self.factory = APIRequestFactory()
+        self.url = reverse("query_dish_by_category")
+
+    def tearDown(self):
+        local_snapshots.clear()
+
+    def query_dishes(self):
+        request = self.factory.get(self.url + f"?categoryId={self.category.id}")
+        force_authenticate(request, user=self.user)
+        return QueryDishByCategoryView.as_view()(request)
+
+    def test_snapshot_is_served_without_queries(self):
+        first = self.query_dishes()
+        with self.assertNumQueries(0):
+            second = self.query_dishes()
+        self.assertEqual(first.data, second.data)
+
+        # a worker with a cold local cache still reads the Redis snapshot
+        local_snapshots.clear()
+        with self.assertNumQueries(0):
+            third = self.query_dishes()
+        self.assertEqual(first.data, third.data)
+
+    def test_status_change_invalidates_snapshot(self):
+        self.assertEqual(self.query_dishes().data["data"][0]["status"], 1)
+
+        url = reverse("change_dish_status", kwargs={"status": 0})
+        request = self.factory.post(url + f"?id={self.dish.id}")
+        force_authenticate(request, user=self.user)
+        ChangeDishStatusView.as_view()(request, status=0)
+
+        self.assertEqual(self.query_dishes().data["data"][0]["status"], 0)
+
+
+class GetOrComputeTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.computed = []
+
+    def compute(self):
+        self.computed.append(1)
+        return "fresh"
+
+    def test_waits_for_the_worker_holding_the_lock(self):
+        lock = cache.lock("shared_lock", timeout=5, thread_local=False)
+        lock.acquire()
+
+        def finish():
+            time.sleep(0.1)
+            cache.set("shared", CachedValue("theirs", 0.1, time.time() + 60), 120)
+            lock.release()
+
+        worker = threading.Thread(target=finish)
+        worker.start()
+        self.assertEqual(get_or_compute("shared", self.compute, 60), "theirs")
+        worker.join()
+        self.assertEqual(self.computed, [])
+
+    def test_serves_stale_value_while_another_worker_refreshes(self):
+        cache.set("shared", CachedValue("stale", 0.1, time.time() - 1), 60)
+        lock = cache.lock("shared_lock", timeout=5)
+        lock.acquire()
+        self.assertEqual(get_or_compute("shared", self.compute, 60), "stale")
+        self.assertEqual(self.computed, [])
+
+        lock.release()
+        self.assertEqual(get_or_compute("shared", self.compute, 60), "fresh")
+        self.assertEqual(get_or_compute("shared", self.compute, 60), "fresh")
+        self.assertEqual(self.computed, [1])
+
+    def test_refreshes_early_as_expiry_nears(self):
+        cache.set("shared", CachedValue("cached", 1.0, time.time() + 0.5), 60)
+        with mock.patch("applications.caching.random.random", return_value=0.1):
+            self.assertEqual(get_or_compute("shared", self.compute, 60), "cached")
+        with mock.patch("applications.caching.random.random", return_value=0.9):
+            self.assertEqual(get_or_compute("shared", self.compute, 60), "fresh")
+
+
+class LocalLRUCacheTests(APITestCase):
+
+    def test_evicts_the_least_recently_used_entry(self):
+        local = LocalLRUCache(2)
+        local.set("a", 1)
+        local.set("b", 2)
+        local.get("a")
+        local.set("c", 3)
+        self.assertEqual((local.get("a"), local.get("b"), local.get("c")), (1, None, 3))
+
+    def test_entries_expire_after_the_timeout(self):
+        local = LocalLRUCache(2, timeout=5)
+        with mock.patch("applications.caching.time.monotonic", return_value=100):
+            local.set("a", 1)
+        with mock.patch("applications.caching.time.monotonic", return_value=104):
+            self.assertEqual(local.get("a"), 1)
+        with mock.patch("applications.caching.time.monotonic", return_value=105):
+            self.assertIsNone(local.get("a"))
+
+
+class RepresentationQueryCountTests(APITestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="test_query_count",
+            password="testpass123",
+            name="test_query_count",
+            phone="12345678901",
+            sex="1",
+            id_number="123456789012345678",
+            status=1,
+        )
+        self.image = UploadedImage.objects.create(file="images/test.png")
+        self.dish_category = Category.objects.create(
+            name="test_dish_category", type=1, sort=1
+        )
+        self.setmeal_category = Category.objects.create(
+            name="test_setmeal_category", type=2, sort=2
+        )
+        self.factory = APIRequestFactory()
+        self.rows = 0
+
+    def tearDown(self):
+        local_snapshots.clear()
+
+    def add_rows(self, count):
+        for i in range(self.rows, self.rows + count):
+            dish = Dish.objects.create(
+                name=f"test_dish_{i}",
+                category_id=self.dish_category,
+                price=10,
+                image=self.image,
+                description="",
+            )
+            DishFlavor.objects.create(dish_id=dish, name="辣度", value="[]")
+            DishFlavor.objects.create(dish_id=dish, name="温度", value="[]")
+            setmeal = Setmeal.objects.create(
+                name=f"test_setmeal_{i}",
+                category_id=self.setmeal_category,
+                price=30,
+                image=self.image,
+                description="",
+            )
+            SetmealDish.objects.create(
+                setmeal_id=setmeal, dish_id=dish, copies=1, name=dish.name, price=10
+            )
+            SetmealDish.objects.create(
+                setmeal_id=setmeal, dish_id=dish, copies=2, name=dish.name, price=10
+            )
+        self.rows += count
+        bump_menu_version()
+
+    def assert_constant_queries(self, view, url, num):
+        for rows in (2, 8):
+            self.add_rows(rows)
+            request = self.factory.get(url)
+            force_authenticate(request, user=self.user)
+            with self.assertNumQueries(num):
+                response = view.as_view()(request)
+            self.assertEqual(response.data["code"], 1)
+
+    def test_pagination_dish(self):
+        # pagination count, page, flavors, total
+        self.assert_constant_queries(
+            PaginationDishView, reverse("pagination_dish") + "?page=1&pageSize=20", 4
+        )
+
+    def test_query_dish_by_category(self):
+        self.assert_constant_queries(
+            QueryDishByCategoryView,
+            reverse("query_dish_by_category")
+            + f"?categoryId={self.dish_category.id}",
+            2,
+        )
+
+    def test_pagination_setmeal(self):
+        self.assert_constant_queries(
+            PaginationSetmealView,
+            reverse("pagination_setmeal") + "?page=1&pageSize=20",
+            4,
+        )
+
+    def test_query_setmeal_by_category(self):
+        self.assert_constant_queries(
+            QuerySetmealByCategoryView,
+            reverse("query_setmeal_by_category")
+            + f"?categoryId={self.setmeal_category.id}",
+            2,
+        )
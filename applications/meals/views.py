@@ -14,6 +14,7 @@ from applications.utils import (
     standard_response,
 )
 
+from .menu_cache import bump_menu_version, get_menu_snapshot
 from .models import Category, Dish, DishFlavor, Setmeal, SetmealDish
 from .serializers import (
     CategoryCreationSerializer,
@@ -41,6 +42,7 @@ class CategoryView(APIView):
             **validated_data, create_user=request.user, update_user=request.user
         )
         response_data = CategoryRepresentationSerializer(created_category).data
+        bump_menu_version()
         return standard_response(True, "Category created successfully", response_data)
 
     def put(self, request, *args, **kwargs):
@@ -53,6 +55,7 @@ class CategoryView(APIView):
         update_category.update_user = request.user
         update_category.save()
         response_data = CategoryRepresentationSerializer(update_category).data
+        bump_menu_version()
         return standard_response(True, "Category updated successfully", response_data)
 
     def delete(self, request, *args, **kwargs):
@@ -63,6 +66,7 @@ class CategoryView(APIView):
 
         category = Category.objects.get(id=_id)
         category.delete()
+        bump_menu_version()
         return standard_response(True, "Category deleted successfully", {})
 
 
@@ -72,14 +76,16 @@ class QueryCategoryByTypeView(APIView):
     def get(self, request, *args, **kwargs):
         _type = request.query_params.get("type", None)
 
-        categorys = Category.objects.all()
-        if _type:
-            categorys = Category.objects.filter(type=_type)
+        def build():
+            categorys = Category.objects.all()
+            if _type:
+                categorys = Category.objects.filter(type=_type)
+            return CategoryRepresentationSerializer(categorys, many=True).data
 
         return standard_response(
             True,
             "Category fetched successfully",
-            CategoryRepresentationSerializer(categorys, many=True).data,
+            get_menu_snapshot(f"category_list_{_type}", build),
         )
 
 
@@ -113,6 +119,7 @@ class ChangeCategoryStatusView(APIView):
         category.update_user = request.user
         category.save()
 
+        bump_menu_version()
         return standard_response(True, msg)
 
 
@@ -176,6 +183,7 @@ class DishView(APIView):
                 value=flavor["value"],
             )
         response_data = DishRepresentationSerializer(created_dish).data
+        bump_menu_version()
         return standard_response(True, "Dish created successfully", response_data)
 
     def put(self, request, *args, **kwargs):
@@ -203,6 +211,7 @@ class DishView(APIView):
                 value=flavor["value"],
             )
         response_data = DishRepresentationSerializer(updated_dish).data
+        bump_menu_version()
         return standard_response(True, "Dish updated successfully", response_data)
 
     def delete(self, request, *args, **kwargs):
@@ -212,6 +221,7 @@ class DishView(APIView):
             raise KeyMissingException(key_name="ids", position="query params")
         dishes = Dish.objects.filter(id__in=ids_list)
         dishes.delete()
+        bump_menu_version()
         return standard_response(True, "Dish deleted successfully")
 
 
@@ -234,11 +244,17 @@ class QueryDishByCategoryView(APIView):
 
         if not category_id:
             raise KeyMissingException(key_name="categoryId", position="query params")
-        dishes = Dish.objects.filter(category_id=category_id)
+
+        def build():
+            dishes = DishRepresentationSerializer.setup_eager_loading(
+                Dish.objects.filter(category_id=category_id)
+            )
+            return DishRepresentationSerializer(dishes, many=True).data
+
         return standard_response(
             True,
             "Get dish data successfully",
-            DishRepresentationSerializer(dishes, many=True).data,
+            get_menu_snapshot(f"dish_list_{category_id}", build),
         )
 
 
@@ -272,6 +288,7 @@ class ChangeDishStatusView(APIView):
         dish.update_user = request.user
         dish.save()
 
+        bump_menu_version()
         return standard_response(True, msg)
 
 
@@ -288,7 +305,9 @@ class PaginationDishView(APIView):
             raise KeyMissingException(key_name="pageSize", position="query params")
 
         paginator = get_custom_pagination(page_size)
-        queryset = Dish.objects.all()
+        queryset = DishRepresentationSerializer.setup_eager_loading(
+            Dish.objects.all()
+        )
         if name:
             queryset = queryset.filter(name__contains=name)
         if category_id:
@@ -337,6 +356,7 @@ class SetMealView(APIView):
                 name=setmeal_dish["name"],
                 price=setmeal_dish["price"],
             )
+        bump_menu_version()
         return standard_response(True, "Setmeal created successfully", {})
 
     def put(self, request, *args, **kwargs):
@@ -363,6 +383,7 @@ class SetMealView(APIView):
                 name=setmeal_dish["name"],
                 price=setmeal_dish["price"],
             )
+        bump_menu_version()
         return standard_response(True, "Setmeal updated successfully", {})
 
     def delete(self, request, *args, **kwargs):
@@ -373,6 +394,7 @@ class SetMealView(APIView):
 
         setmeals = Setmeal.objects.filter(id__in=ids_list)
         setmeals.delete()
+        bump_menu_version()
         return standard_response(True, "Setmeal deleted successfully", {})
 
 
@@ -398,11 +420,17 @@ class QuerySetmealByCategoryView(APIView):
 
         if not category_id:
             raise KeyMissingException(key_name="categoryId", position="query params")
-        setmeals = Setmeal.objects.filter(category_id=category_id)
+
+        def build():
+            setmeals = SetmealRepresentationSerializer.setup_eager_loading(
+                Setmeal.objects.filter(category_id=category_id)
+            )
+            return SetmealRepresentationSerializer(setmeals, many=True).data
+
         return standard_response(
             True,
             "Get dish data successfully",
-            SetmealRepresentationSerializer(setmeals, many=True).data,
+            get_menu_snapshot(f"setmeal_list_{category_id}", build),
         )
 
 
@@ -419,7 +447,9 @@ class PaginationSetmealView(APIView):
             raise KeyMissingException(key_name="pageSize", position="query params")
 
         paginator = get_custom_pagination(page_size)
-        queryset = Setmeal.objects.all()
+        queryset = SetmealRepresentationSerializer.setup_eager_loading(
+            Setmeal.objects.all()
+        )
         if name:
             queryset = queryset.filter(name__contains=name)
         if category_id:
@@ -468,4 +498,5 @@ class ChangeSetmealStatusView(APIView):
         setmeal.update_user = request.user
         setmeal.save()
 
+        bump_menu_version()
         return standard_response(True, msg)
@@ -0,0 +1,67 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django_redis import get_redis_connection
+
+from .models import Order
+
+ORDER_STATUS_COUNTS_KEY = "order_status_counts"
+# the hash is rebuilt from MySQL whenever it expires
+ORDER_STATUS_COUNTS_TIMEOUT = 300
+
+# KEYS[1]: counts hash, ARGV: pairs of status and delta
+INCREMENT_COUNTS_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV, 2 do
+    redis.call("HINCRBY", KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+increment_counts = get_redis_connection("default").register_script(
+    INCREMENT_COUNTS_SCRIPT
+)
+
+
+def _counts_key():
+    return cache.make_key(ORDER_STATUS_COUNTS_KEY)
+
+
+def reconcile_status_counts():
+    """Rebuild the counters from a single grouped aggregate over Order."""
+    counts = {status: 0 for status, _ in Order._meta.get_field("status").choices}
+    for row in Order.objects.values("status").annotate(count=Count("id")):
+        counts[row["status"]] = row["count"]
+
+    pipeline = get_redis_connection("default").pipeline()
+    pipeline.delete(_counts_key())
+    pipeline.hset(_counts_key(), mapping=counts)
+    pipeline.expire(_counts_key(), ORDER_STATUS_COUNTS_TIMEOUT)
+    pipeline.execute()
+    return counts
+
+
+def get_status_counts():
+    raw_counts = get_redis_connection("default").hgetall(_counts_key())
+    if not raw_counts:
+        return reconcile_status_counts()
+    return {int(status): int(count) for status, count in raw_counts.items()}
+
+
+def _increment_counts(deltas):
+    args = [value for status_delta in deltas.items() for value in status_delta]
+    # counters are only touched once the change is committed; a missing hash
+    # is left alone and rebuilt on the next read
+    transaction.on_commit(
+        lambda: increment_counts(keys=[_counts_key()], args=args)
+    )
+
+
+def record_order_created(status=1):
+    _increment_counts({status: 1})
+
+
+def record_transition(source, target, count=1):
+    _increment_counts({source: -count, target: count})
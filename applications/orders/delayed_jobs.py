@@ -0,0 +1,122 @@
+import heapq
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+
+from .models import Order
+from .transitions import UNPAID, transition_orders
+
+ORDER_CANCEL_QUEUE = "order_cancel"
+
+# KEYS[1]: sorted set, ARGV: now, batch size, lease deadline
+LEASE_DUE_JOBS_SCRIPT = """
+local jobs = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+for _, job in ipairs(jobs) do
+    redis.call("ZADD", KEYS[1], ARGV[3], job)
+end
+return jobs
+"""
+
+lease_due_jobs = get_redis_connection("default").register_script(
+    LEASE_DUE_JOBS_SCRIPT
+)
+
+
+class RedisDelayedQueue:
+    """
+    Delayed jobs kept in one Redis sorted set scored by their due time.
+
+    Leased jobs are pushed ``lease`` seconds into the future instead of being
+    removed, so a worker that dies before ``ack`` only delays them.
+    """
+
+    def __init__(self, name):
+        self.key = cache.make_key(f"delayed_jobs_{name}")
+        self.connection = get_redis_connection("default")
+
+    def schedule(self, job, run_at):
+        self.connection.zadd(self.key, {job: run_at})
+
+    def lease_due(self, now, limit, lease):
+        jobs = lease_due_jobs(keys=[self.key], args=[now, limit, now + lease])
+        return [job.decode() for job in jobs]
+
+    def ack(self, jobs):
+        if jobs:
+            self.connection.zrem(self.key, *jobs)
+
+    def __len__(self):
+        return self.connection.zcard(self.key)
+
+
+class InMemoryDelayedQueue:
+    """Process-local stand-in for RedisDelayedQueue, used by tests."""
+
+    _queues = {}
+    _lock = threading.Lock()
+
+    def __init__(self, name):
+        with self._lock:
+            self.heap, self.scores = self._queues.setdefault(name, ([], {}))
+
+    def schedule(self, job, run_at):
+        with self._lock:
+            self.scores[job] = run_at
+            heapq.heappush(self.heap, (run_at, job))
+
+    def lease_due(self, now, limit, lease):
+        jobs = []
+        with self._lock:
+            while self.heap and self.heap[0][0] <= now and len(jobs) < limit:
+                run_at, job = heapq.heappop(self.heap)
+                # skip entries superseded by a later schedule or lease
+                if self.scores.get(job) == run_at:
+                    jobs.append(job)
+            for job in jobs:
+                self.scores[job] = now + lease
+                heapq.heappush(self.heap, (now + lease, job))
+        return jobs
+
+    def ack(self, jobs):
+        with self._lock:
+            for job in jobs:
+                self.scores.pop(job, None)
+
+    def __len__(self):
+        return len(self.scores)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._queues.clear()
+
+
+def get_delayed_queue(name):
+    return import_string(settings.DELAYED_QUEUE_BACKEND)(name)
+
+
+def schedule_order_cancel(order):
+    run_at = time.time() + settings.ORDER_PAYMENT_TIMEOUT.total_seconds()
+    get_delayed_queue(ORDER_CANCEL_QUEUE).schedule(str(order.id), run_at)
+
+
+def cancel_unpaid_orders(order_ids):
+    # jobs are never removed on payment or cancellation; the lookup announced
+    # to orders_transitioned must only match the orders moved here, so the
+    # unpaid ones are locked until they are canceled
+    with transaction.atomic():
+        unpaid_ids = list(
+            Order.objects.select_for_update()
+            .filter(id__in=order_ids, status=UNPAID)
+            .values_list("id", flat=True)
+        )
+        if not unpaid_ids:
+            return 0
+        return transition_orders(
+            "timeout", {"id__in": unpaid_ids}, cancel_reason="Payment timed out"
+        )
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from http.cookies import SimpleCookie
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENTS_CHANNEL = "order_events"
+# message types understood by the admin console
+ORDER_PAID_EVENT, ORDER_REMINDER_EVENT = 1, 2
+
+
+class EventHub:
+    """Fans the events received by this process out to its open connections."""
+
+    def __init__(self):
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        with self._lock:
+            self._queues[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._queues.pop(queue, None)
+
+    def dispatch(self, message):
+        # called from the publishing or listener thread, never the event loop
+        with self._lock:
+            subscribers = list(self._queues.items())
+        for queue, loop in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    def __len__(self):
+        return len(self._queues)
+
+
+hub = EventHub()
+
+
+class RedisEventBroker:
+    """
+    Events published on a Redis pub/sub channel.
+
+    Each process holds a single subscription, read by a daemon thread that
+    hands every message to the process-wide hub, however many connections
+    are open.
+    """
+
+    _listener = None
+    _lock = threading.Lock()
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.channel = cache.make_key(ORDER_EVENTS_CHANNEL)
+
+    def publish(self, message):
+        get_redis_connection("default").publish(self.channel, message)
+
+    def start(self):
+        with self._lock:
+            if RedisEventBroker._listener is None:
+                RedisEventBroker._listener = threading.Thread(
+                    target=self._listen, name="order-events", daemon=True
+                )
+                RedisEventBroker._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = get_redis_connection("default").pubsub(
+                    ignore_subscribe_messages=True
+                )
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    self.hub.dispatch(message["data"].decode())
+            except Exception:
+                logger.exception("Order event subscription lost, reconnecting")
+                time.sleep(1)
+
+
+class InMemoryEventBroker:
+    """Process-local stand-in for RedisEventBroker, used by tests."""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, message):
+        self.hub.dispatch(message)
+
+    def start(self):
+        pass
+
+
+def get_event_broker():
+    return import_string(settings.ORDER_EVENTS_BACKEND)(hub)
+
+
+def publish_order_event(event_type, order_id, order_number):
+    message = json.dumps(
+        {
+            "type": event_type,
+            "orderId": order_id,
+            "content": f"订单号：{order_number}",
+        },
+        ensure_ascii=False,
+    )
+    transaction.on_commit(lambda: get_event_broker().publish(message))
+
+
+def authenticate_console(scope):
+    """
+    Return the employee whose JWT cookie, set by the admin login, came with
+    the handshake, or None. Browsers cannot add headers to a WebSocket.
+    """
+    cookies = SimpleCookie(
+        dict(scope.get("headers", [])).get(b"cookie", b"").decode("latin-1")
+    )
+    morsel = cookies.get(settings.REST_AUTH["JWT_AUTH_COOKIE"])
+    if morsel is None:
+        return None
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(morsel.value))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def order_events_websocket(scope, receive, send):
+    """ASGI app pushing every order event to the connected admin console."""
+    if (await receive())["type"] != "websocket.connect":
+        return
+    if await sync_to_async(authenticate_console)(scope) is None:
+        # closing before accepting rejects the handshake with a 403
+        await send({"type": "websocket.close", "code": 4401})
+        return
+    await send({"type": "websocket.accept"})
+    get_event_broker().start()
+    queue = hub.subscribe()
+    receiving = asyncio.ensure_future(receive())
+    try:
+        while True:
+            getting = asyncio.ensure_future(queue.get())
+            await asyncio.wait(
+                {receiving, getting}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if getting.done():
+                await send({"type": "websocket.send", "text": getting.result()})
+            else:
+                getting.cancel()
+            if receiving.done():
+                if receiving.result()["type"] == "websocket.disconnect":
+                    return
+                # the console never sends anything worth handling
+                receiving = asyncio.ensure_future(receive())
+    finally:
+        hub.unsubscribe(queue)
+        receiving.cancel()
@@ -0,0 +1,299 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from applications.customers.cart import ShoppingCart
+from applications.customers.models import Address, WechatCostomer
+from applications.file_upload.models import UploadedImage
+from applications.meals.models import Category, Dish, DishFlavor, Setmeal, SetmealDish
+
+FLOWS = (
+    "menu_categories",
+    "menu_dishes",
+    "menu_setmeals",
+    "cart_add",
+    "cart_sub",
+    "cart_list",
+    "order_submit",
+    "order_pay",
+    "order_history",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a menu and customers, then drive the customer routes in-process "
+        "and report throughput, latency and queries per flow. "
+        "Run with DJANGO_SETTINGS_MODULE=django_project.bench_settings"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dishes", type=int, default=2000)
+        parser.add_argument("--setmeals", type=int, default=200)
+        parser.add_argument("--customers", type=int, default=500)
+        parser.add_argument("--requests", type=int, default=300, help="Per flow")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Defaults to bench-<commit>.json")
+        parser.add_argument("--baseline", help="Earlier results to compare with")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError(
+                "bench seeds and writes data, run it with "
+                "DJANGO_SETTINGS_MODULE=django_project.bench_settings"
+            )
+        random.seed(options["seed"])
+        call_command("migrate", verbosity=0)
+        started = time.perf_counter()
+        self.seed(options["dishes"], options["setmeals"], options["customers"])
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f} s")
+
+        self.client = Client()
+        results = {flow: [] for flow in FLOWS}
+        for _ in range(options["requests"]):
+            self.run_iteration(results)
+
+        commit = self.get_commit()
+        report = {
+            "commit": commit,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "options": {
+                key: options[key]
+                for key in ("dishes", "setmeals", "customers", "requests", "seed")
+            },
+            "flows": {
+                flow: self.summarize(samples) for flow, samples in results.items()
+            },
+        }
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)["flows"]
+        self.print_report(report["flows"], baseline)
+
+        output = options["output"] or f"bench-{commit or 'local'}.json"
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
+
+    def seed(self, dish_count, setmeal_count, customer_count):
+        image = UploadedImage.objects.create(file="images/bench.png")
+        dish_categories = Category.objects.bulk_create(
+            Category(name=f"bench dishes {i}", type=1, sort=i)
+            for i in range(max(dish_count // 100, 1))
+        )
+        setmeal_categories = Category.objects.bulk_create(
+            Category(name=f"bench setmeals {i}", type=2, sort=10_000 + i)
+            for i in range(max(setmeal_count // 50, 1))
+        )
+        dishes = Dish.objects.bulk_create(
+            Dish(
+                name=f"bench dish {i}",
+                category_id=random.choice(dish_categories),
+                price=random.randint(5, 80),
+                image=image,
+                description="bench",
+            )
+            for i in range(dish_count)
+        )
+        DishFlavor.objects.bulk_create(
+            DishFlavor(dish_id=dish, name=name, value=value)
+            for dish in dishes
+            for name, value in (
+                ("spicy", '["none","mild","hot"]'),
+                ("size", '["S","L"]'),
+            )
+        )
+        setmeals = Setmeal.objects.bulk_create(
+            Setmeal(
+                name=f"bench setmeal {i}",
+                category_id=random.choice(setmeal_categories),
+                price=random.randint(30, 200),
+                image=image,
+                description="bench",
+            )
+            for i in range(setmeal_count)
+        )
+        SetmealDish.objects.bulk_create(
+            SetmealDish(
+                setmeal_id=setmeal,
+                dish_id=dish,
+                copies=1,
+                name=dish.name,
+                price=dish.price,
+            )
+            for setmeal in setmeals
+            for dish in random.sample(dishes, 3)
+        )
+        customers = WechatCostomer.objects.bulk_create(
+            WechatCostomer(openid=f"bench_{i}", name=f"bench_{i}")
+            for i in range(customer_count)
+        )
+        addresses = Address.objects.bulk_create(
+            Address(
+                customer_id=customer,
+                consignee=customer.name,
+                phone=f"138{i:08d}",
+                province_code="11",
+                province_name="北京市",
+                city_code="1101",
+                city_name="市辖区",
+                district_code="110101",
+                district_name="东城区",
+                detail="bench",
+                is_default=True,
+            )
+            for i, customer in enumerate(customers)
+        )
+
+        self.dish_categories = [category.id for category in dish_categories]
+        self.setmeal_categories = [category.id for category in setmeal_categories]
+        self.dishes = [dish.id for dish in dishes]
+        self.setmeals = [setmeal.id for setmeal in setmeals]
+        self.customers = [
+            (
+                customer.id,
+                address.id,
+                {"authentication": str(RefreshToken.for_user(customer).access_token)},
+            )
+            for customer, address in zip(customers, addresses)
+        ]
+
+    def request(self, results, flow, method, path, headers, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(self.client, method)(
+                path, data, content_type="application/json", headers=headers
+            )
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(
+                f"{flow}: {method.upper()} {path} -> {response.status_code}"
+            )
+        results[flow].append((elapsed, len(queries)))
+        return response
+
+    def run_iteration(self, results):
+        customer_id, address_id, headers = random.choice(self.customers)
+        dish_category = random.choice(self.dish_categories)
+        setmeal_category = random.choice(self.setmeal_categories)
+        dish_id = random.choice(self.dishes)
+
+        self.request(
+            results, "menu_categories", "get", "/user/category/list?type=1", headers
+        )
+        self.request(
+            results,
+            "menu_dishes",
+            "get",
+            f"/user/dish/list?categoryId={dish_category}",
+            headers,
+        )
+        self.request(
+            results,
+            "menu_setmeals",
+            "get",
+            f"/user/setmeal/list?categoryId={setmeal_category}",
+            headers,
+        )
+
+        cart = {"dishId": dish_id}
+        self.request(
+            results, "cart_add", "post", "/user/shoppingCart/add", headers, cart
+        )
+        self.request(
+            results, "cart_add", "post", "/user/shoppingCart/add", headers, cart
+        )
+        self.request(
+            results, "cart_sub", "post", "/user/shoppingCart/sub", headers, cart
+        )
+        self.request(results, "cart_list", "get", "/user/shoppingCart/list", headers)
+
+        # fill the rest of a typical basket without timing it
+        basket = ShoppingCart(customer_id)
+        for dish_id in random.sample(self.dishes, 2):
+            basket.add(f"dish_{dish_id}")
+        basket.add(f"setmeal_{random.choice(self.setmeals)}")
+        order = self.request(
+            results,
+            "order_submit",
+            "post",
+            "/user/order/submit",
+            headers,
+            {
+                "addressBookId": address_id,
+                "amount": 100,
+                "deliveryStatus": 1,
+                "estimatedDeliveryTime": "2024-07-01T12:00:00",
+                "packAmount": 6,
+                "payMethod": 1,
+                "remark": "",
+                "tablewareNumber": 1,
+                "tablewareStatus": 1,
+            },
+        ).json()["data"]
+        self.request(
+            results,
+            "order_pay",
+            "put",
+            "/user/order/payment",
+            headers,
+            {"orderNumber": order["orderNumber"], "payMethod": 1},
+        )
+        self.request(
+            results,
+            "order_history",
+            "get",
+            "/user/order/historyOrders?pageSize=10",
+            headers,
+        )
+
+    def summarize(self, samples):
+        timings = sorted(elapsed for elapsed, _ in samples)
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+        return {
+            "requests": len(samples),
+            "requests_per_second": round(len(samples) / sum(timings), 1),
+            "p50_ms": round(statistics.median(timings) * 1000, 2),
+            "p99_ms": round(percentiles[98] * 1000, 2),
+            "queries_per_request": round(
+                statistics.mean(queries for _, queries in samples), 2
+            ),
+        }
+
+    def print_report(self, flows, baseline):
+        self.stdout.write(
+            f"{'flow':<16}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'queries':>10}"
+        )
+        for flow, summary in flows.items():
+            line = (
+                f"{flow:<16}{summary['requests_per_second']:>10}"
+                f"{summary['p50_ms']:>10}{summary['p99_ms']:>10}"
+                f"{summary['queries_per_request']:>10}"
+            )
+            if baseline and flow in baseline:
+                before = baseline[flow]["requests_per_second"]
+                change = (summary["requests_per_second"] - before) / before * 100
+                line += f"  {change:+.1f}% req/s"
+            self.stdout.write(line)
+
+    def get_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
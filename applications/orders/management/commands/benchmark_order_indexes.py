@@ -0,0 +1,164 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from applications.customers.models import Address, WechatCostomer
+from applications.orders.models import Order
+
+BENCH_PREFIX = "bench"
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed orders and report EXPLAIN plans and timings of the order query "
+        "shapes with and without the Order indexes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=1_000_000)
+        parser.add_argument("--customers", type=int, default=10_000)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--skip-seed", action="store_true", help="Reuse previously seeded orders"
+        )
+        parser.add_argument(
+            "--clean", action="store_true", help="Delete seeded data and exit"
+        )
+
+    def handle(self, *args, **options):
+        name = str(connection.settings_dict["NAME"])
+        if connection.vendor != "sqlite" and not name.startswith("test_"):
+            raise CommandError(
+                "benchmark_order_indexes drops the Order indexes and seeds "
+                f"orders, point it at a disposable test_* database, not {name}"
+            )
+        if options["clean"]:
+            Order.objects.filter(number__startswith=BENCH_PREFIX).delete()
+            WechatCostomer.objects.filter(openid__startswith=BENCH_PREFIX).delete()
+            self.stdout.write(self.style.SUCCESS("Seeded data deleted"))
+            return
+
+        if not options["skip_seed"]:
+            self.seed(options["orders"], options["customers"], options["batch_size"])
+
+        customer_id = (
+            Order.objects.filter(number__startswith=BENCH_PREFIX)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+        query_shapes = {
+            "history": Order.objects.filter(user_id=customer_id).order_by(
+                "-order_time", "-id"
+            )[:10],
+            "history_by_status": Order.objects.filter(
+                user_id=customer_id, status=5
+            ).order_by("-order_time", "-id")[:10],
+            "condition_deep_page": Order.objects.order_by("-order_time", "-id")[
+                10_000:10_010
+            ],
+            "condition_by_status": Order.objects.filter(status=2).order_by(
+                "-order_time", "-id"
+            )[:10],
+            "condition_by_phone": Order.objects.filter(phone="13800000042").order_by(
+                "-order_time", "-id"
+            )[:10],
+            "statistics": Order.objects.filter(status=3),
+        }
+
+        indexes = Order._meta.indexes
+        with connection.schema_editor() as schema_editor:
+            for index in indexes:
+                schema_editor.remove_index(Order, index)
+        try:
+            self.stdout.write(self.style.WARNING("Without indexes"))
+            self.report(query_shapes, options["repeat"])
+        finally:
+            with connection.schema_editor() as schema_editor:
+                for index in indexes:
+                    schema_editor.add_index(Order, index)
+        self.stdout.write(self.style.WARNING("With indexes"))
+        self.report(query_shapes, options["repeat"])
+
+    def seed(self, order_count, customer_count, batch_size):
+        WechatCostomer.objects.bulk_create(
+            WechatCostomer(openid=f"{BENCH_PREFIX}_{i}", name=f"{BENCH_PREFIX}_{i}")
+            for i in range(customer_count)
+        )
+        # MySQL does not return primary keys from bulk_create, so read them back
+        customers = WechatCostomer.objects.filter(openid__startswith=BENCH_PREFIX)
+        Address.objects.bulk_create(
+            Address(
+                customer_id=customer,
+                consignee=customer.name,
+                phone=f"138{i:08d}",
+                province_code="11",
+                province_name="北京市",
+                city_code="1101",
+                city_name="市辖区",
+                district_code="110101",
+                district_name="东城区",
+                detail="bench",
+            )
+            for i, customer in enumerate(customers)
+        )
+        addresses = list(Address.objects.filter(customer_id__in=customers))
+
+        now = timezone.now()
+        one_year = 365 * 24 * 3600
+        for start in range(0, order_count, batch_size):
+            orders, order_times = [], {}
+            for i in range(start, min(start + batch_size, order_count)):
+                address = random.choice(addresses)
+                number = f"{BENCH_PREFIX}{i}"
+                age = timedelta(seconds=random.randint(0, one_year))
+                order_times[number] = now - age
+                orders.append(
+                    Order(
+                        number=number,
+                        status=random.randint(1, 6),
+                        user_id_id=address.customer_id_id,
+                        address_book_id=address,
+                        pay_method=1,
+                        amount=random.randint(10, 300),
+                        phone=address.phone,
+                        delivery_status=1,
+                        pack_amount=6,
+                        tableware_number=1,
+                        tableware_status=1,
+                    )
+                )
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                # order_time is auto_now_add, so the spread out order times
+                # are written afterwards; read the keys back for MySQL
+                created = list(
+                    Order.objects.filter(number__in=order_times).only("id", "number")
+                )
+                for order in created:
+                    order.order_time = order_times[order.number]
+                Order.objects.bulk_update(created, ["order_time"], batch_size=1000)
+            self.stdout.write(f"Seeded {start + len(orders)}/{order_count} orders")
+
+    def report(self, query_shapes, repeat):
+        for label, queryset in query_shapes.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                # clone the queryset so no run is served from the result cache
+                if label == "statistics":
+                    queryset.all().count()
+                else:
+                    list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{label}: median {statistics.median(timings):.2f} ms"
+                )
+            )
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,80 @@
+import os
+import time
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.orders.numbers import (
+    MAX_WORKER_ID,
+    NUMBER_WIDTH,
+    OrderNumberGenerator,
+)
+
+
+def generate(worker_id, count):
+    generator = OrderNumberGenerator(worker_id)
+    started = time.time()
+    numbers = [generator.next_number() for _ in range(count)]
+    return worker_id, numbers, started, time.time()
+
+
+class Command(BaseCommand):
+    help = (
+        "Report how many order numbers one process and many worker processes "
+        "generate per second, and check the workers' numbers for collisions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", type=int, default=2_000_000)
+        parser.add_argument("--workers", type=int, default=64)
+        parser.add_argument("--ids-per-worker", type=int, default=20_000)
+        parser.add_argument("--processes", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if not 1 <= options["workers"] <= MAX_WORKER_ID + 1:
+            raise CommandError(f"--workers must be between 1 and {MAX_WORKER_ID + 1}")
+
+        generator = OrderNumberGenerator(0)
+        next_id = generator.next_id
+        started = time.perf_counter()
+        for _ in range(options["ids"]):
+            next_id()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"ids/s:     {options['ids'] / elapsed:,.0f}")
+        started = time.perf_counter()
+        for _ in range(options["ids"]):
+            generator.next_number()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"numbers/s: {options['ids'] / elapsed:,.0f}")
+
+        with Pool(options["processes"]) as pool:
+            results = pool.starmap(
+                generate,
+                [
+                    (worker_id, options["ids_per_worker"])
+                    for worker_id in range(options["workers"])
+                ],
+            )
+        first_start = min(started for *_, started, _ in results)
+        last_stop = max(stopped for *_, stopped in results)
+        seen, total = set(), 0
+        for worker_id, numbers, *_ in results:
+            if numbers != sorted(numbers):
+                raise CommandError(f"Worker {worker_id} numbers are not increasing")
+            if any(len(number) != NUMBER_WIDTH for number in numbers):
+                raise CommandError(f"Worker {worker_id} numbers are not fixed width")
+            seen.update(numbers)
+            total += len(numbers)
+        collisions = total - len(seen)
+        self.stdout.write(
+            f"{total:,} numbers from {options['workers']} workers, "
+            f"{collisions} collisions"
+        )
+        # workers only run side by side up to the number of CPUs
+        self.stdout.write(
+            f"all workers numbers/s: {total / (last_stop - first_start):,.0f} "
+            f"on {os.cpu_count()} CPUs"
+        )
+        if collisions:
+            raise CommandError("Order numbers collided")
+        self.stdout.write(self.style.SUCCESS("No collisions"))
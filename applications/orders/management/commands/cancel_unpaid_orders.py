@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from applications.orders.delayed_jobs import (
+    ORDER_CANCEL_QUEUE,
+    cancel_unpaid_orders,
+    get_delayed_queue,
+)
+
+
+class Command(BaseCommand):
+    help = "Start delayed job worker to cancel unpaid orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--interval", type=float, default=1.0, help="Seconds between polls"
+        )
+        parser.add_argument(
+            "--lease", type=float, default=60.0, help="Seconds before retrying a job"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Drain due jobs once and exit"
+        )
+
+    def handle(self, *args, **options):
+        queue = get_delayed_queue(ORDER_CANCEL_QUEUE)
+        self.stdout.write(self.style.SUCCESS("Order cancel worker started"))
+
+        try:
+            while True:
+                order_ids = queue.lease_due(
+                    time.time(), options["batch_size"], options["lease"]
+                )
+                if order_ids:
+                    canceled = cancel_unpaid_orders(order_ids)
+                    queue.ack(order_ids)
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"{canceled} of {len(order_ids)} due orders canceled"
+                        )
+                    )
+                if len(order_ids) < options["batch_size"]:
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("Order cancel worker stopped"))
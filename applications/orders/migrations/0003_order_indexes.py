@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_rename_addressbook_address'),
+        ('orders', '0002_alter_order_address_alter_order_consignee_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user_id', 'order_time'], name='order_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user_id', 'status', 'order_time'], name='order_user_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_time'], name='order_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'order_time'], name='order_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['phone', 'order_time'], name='order_phone_time_idx'),
+        ),
+    ]
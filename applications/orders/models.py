@@ -46,6 +46,20 @@ class Order(models.Model):
     tableware_number = models.IntegerField()
     tableware_status = models.IntegerField(choices=((1, "yes"), (0, "no")))
 
+    class Meta:
+        indexes = [
+            # history: user_id = ? [AND status = ?] ORDER BY order_time DESC
+            models.Index(fields=["user_id", "order_time"], name="order_user_time_idx"),
+            models.Index(
+                fields=["user_id", "status", "order_time"],
+                name="order_user_status_time_idx",
+            ),
+            # condition search and statistics
+            models.Index(fields=["order_time"], name="order_time_idx"),
+            models.Index(fields=["status", "order_time"], name="order_status_time_idx"),
+            models.Index(fields=["phone", "order_time"], name="order_phone_time_idx"),
+        ]
+
 
 class OrderDetail(models.Model):
     name = models.CharField(max_length=32)
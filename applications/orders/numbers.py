@@ -0,0 +1,145 @@
+import math
+import os
+import threading
+import time
+import uuid
+import weakref
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+# 41 bits of milliseconds since EPOCH_MS, 10 bits of worker id, 12 of sequence
+EPOCH_MS = 1704067200000  # 2024-01-01 UTC
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+# enough digits for any 63-bit id, so numbers sort like the ids
+NUMBER_WIDTH = 19
+
+WORKER_LEASE_TIMEOUT = 600
+WORKER_COUNTER_KEY = "order_number_workers"
+
+# KEYS[1]: worker lease, ARGV: lease token, timeout
+RENEW_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("EXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+renew_lease = get_redis_connection("default").register_script(RENEW_LEASE_SCRIPT)
+
+
+def _lease_key(worker_id):
+    return cache.make_key(f"order_number_worker_{worker_id}")
+
+
+class OrderNumberGenerator:
+    """
+    Snowflake-style order numbers: fixed width, time ordered and unique
+    across processes and hosts.
+
+    Each process leases its own worker id in Redis for
+    ``WORKER_LEASE_TIMEOUT`` seconds, renewed while numbers are generated; a
+    forked process leases a new one. ``worker_id`` pins it instead, for
+    benchmarks and tests.
+
+    Numbers keep increasing when the clock steps back; past 4096 numbers in
+    a millisecond the generator borrows the next millisecond instead of
+    waiting for it.
+    """
+
+    def __init__(self, worker_id=None):
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+        self._configured_worker_id = worker_id
+        self._lock = threading.Lock()
+        self._reset()
+        _generators.add(self)
+
+    def _reset(self):
+        self.worker_id = None
+        self._worker_bits = 0
+        self._lease_token = None
+        self._renew_at_ms = 0
+        self._last_ms, self._sequence = -1, 0
+
+    def next_number(self):
+        return f"{self.next_id():0{NUMBER_WIDTH}d}"
+
+    def next_id(self):
+        with self._lock:
+            now = time.time_ns() // 1_000_000 - EPOCH_MS
+            if now >= self._renew_at_ms:
+                self._start_or_renew(now)
+
+            if now > self._last_ms:
+                self._last_ms, self._sequence = now, 0
+            else:
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms, self._sequence = self._last_ms + 1, 0
+            return (
+                self._last_ms << (WORKER_ID_BITS + SEQUENCE_BITS)
+                | self._worker_bits
+                | self._sequence
+            )
+
+    def _start_or_renew(self, now):
+        if self.worker_id is None:
+            if self._configured_worker_id is None:
+                self._lease_worker_id()
+            else:
+                self._set_worker_id(self._configured_worker_id)
+                self._renew_at_ms = math.inf
+        else:
+            self._renew_lease()
+        if self._lease_token:
+            self._renew_at_ms = now + WORKER_LEASE_TIMEOUT * 1000 // 3
+
+    def _set_worker_id(self, worker_id):
+        self.worker_id = worker_id
+        self._worker_bits = worker_id << SEQUENCE_BITS
+
+    def _lease_worker_id(self):
+        connection = get_redis_connection("default")
+        token = uuid.uuid4().hex
+        # start probing at a different slot each time to spread the workers
+        start = connection.incr(cache.make_key(WORKER_COUNTER_KEY))
+        for offset in range(MAX_WORKER_ID + 1):
+            worker_id = (start + offset) & MAX_WORKER_ID
+            if connection.set(
+                _lease_key(worker_id), token, nx=True, ex=WORKER_LEASE_TIMEOUT
+            ):
+                self._set_worker_id(worker_id)
+                self._lease_token = token
+                return
+        raise RuntimeError("Every order number worker id is leased")
+
+    def _renew_lease(self):
+        if not renew_lease(
+            keys=[_lease_key(self.worker_id)],
+            args=[self._lease_token, WORKER_LEASE_TIMEOUT],
+        ):
+            # idle for longer than the lease, someone else may own the id now
+            self._lease_worker_id()
+
+
+_generators = weakref.WeakSet()
+
+
+def _reset_generators():
+    # a forked process must not reuse its parent's worker id
+    for generator in _generators:
+        generator._lock = threading.Lock()
+        generator._reset()
+
+
+os.register_at_fork(after_in_child=_reset_generators)
+
+order_numbers = OrderNumberGenerator()
+
+
+def next_order_number():
+    return order_numbers.next_number()
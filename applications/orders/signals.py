@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+# Both are sent inside the transaction writing the orders. Receivers doing
+# more than reading should defer it with transaction.on_commit, so the
+# transaction stays short and rolled back writes are never counted.
+
+# order: the created Order
+order_created = Signal()
+# target: the status the orders moved to, lookup: filter matching them
+orders_transitioned = Signal()
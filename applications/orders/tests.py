@@ -1,3 +1,727 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django_redis import get_redis_connection
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from applications.customers.cart import ShoppingCart
+from applications.customers.models import Address, WechatCostomer
+from applications.file_upload.models import UploadedImage
+from applications.meals.models import Category, Dish, Setmeal
+from applications.renderers import ORJSONRenderer
+from applications.reports.models import DailyRollup
+
+from .counters import ORDER_STATUS_COUNTS_KEY
+from .delayed_jobs import (
+    ORDER_CANCEL_QUEUE,
+    InMemoryDelayedQueue,
+    cancel_unpaid_orders,
+)
+from .events import authenticate_console, hub, order_events_websocket
+from .management.commands.bench import FLOWS
+from .models import Order, OrderDetail
+from .numbers import (
+    MAX_SEQUENCE,
+    MAX_WORKER_ID,
+    NUMBER_WIDTH,
+    SEQUENCE_BITS,
+    WORKER_ID_BITS,
+    OrderNumberGenerator,
+    _lease_key,
+)
+from .serializers import OrderRrepresentationSerializer
+from .signals import orders_transitioned
+from .transitions import transition_order
+from .views import (
+    OrderCancelView,
+    OrderComfirmView,
+    OrderCreateView,
+    OrderPaymentView,
+    OrderReminderView,
+    OrderRepetitionView,
+    PaginationOrderHistoryView,
+    QueryOrderStatisticsView,
+)
 
 # Create your tests here.
+
+
+def create_customer_with_address(openid):
+    customer = WechatCostomer.objects.create(openid=openid, name=openid)
+    address = Address.objects.create(
+        customer_id=customer,
+        consignee="test_consignee",
+        phone="12345678901",
+        province_code="11",
+        province_name="北京市",
+        city_code="1101",
+        city_name="市辖区",
+        district_code="110101",
+        district_name="东城区",
+        detail="test_detail",
+    )
+    return customer, address
+
+
+def create_order(customer, address, number, **kwargs):
+    return Order.objects.create(
+        number=number,
+        user_id=customer,
+        address_book_id=address,
+        pay_method=1,
+        amount=100,
+        phone=address.phone,
+        delivery_status=1,
+        pack_amount=6,
+        tableware_number=1,
+        tableware_status=1,
+        **kwargs,
+    )
+
+
+@override_settings(
+    DELAYED_QUEUE_BACKEND="applications.orders.delayed_jobs.InMemoryDelayedQueue"
+)
+class OrderCreateViewTests(APITestCase):
+
+    def setUp(self):
+        self.customer, self.address = create_customer_with_address(
+            "test_order_submit"
+        )
+        image = UploadedImage.objects.create(file="images/test.png")
+        category = Category.objects.create(name="test_category", type=1, sort=1)
+        self.dishes = [
+            Dish.objects.create(
+                name=f"test_dish_{i}",
+                category_id=category,
+                price=10 + i,
+                image=image,
+                description="",
+            )
+            for i in range(5)
+        ]
+        self.setmeal = Setmeal.objects.create(
+            name="test_setmeal",
+            category_id=category,
+            price=30,
+            image=image,
+            description="",
+        )
+        self.cart = ShoppingCart(self.customer.id)
+        DailyRollup.objects.create(date=timezone.localdate())
+        self.factory = APIRequestFactory()
+        self.view = OrderCreateView.as_view()
+        self.url = reverse("order_submit")
+        self.data = {
+            "addressBookId": self.address.id,
+            "amount": 100,
+            "deliveryStatus": 1,
+            "estimatedDeliveryTime": "2024-07-01T12:00:00",
+            "packAmount": 6,
+            "payMethod": 1,
+            "remark": "",
+            "tablewareNumber": 1,
+            "tablewareStatus": 1,
+        }
+
+    def tearDown(self):
+        self.cart.clear()
+        InMemoryDelayedQueue.clear()
+
+    def submit(self):
+        request = self.factory.post(self.url, self.data, format="json")
+        force_authenticate(request, user=self.customer)
+        return self.view(request)
+
+    def test_submit_writes_all_details_in_constant_queries(self):
+        for dish in self.dishes:
+            self.cart.add(f"dish_{dish.id}")
+        self.cart.add(f"setmeal_{self.setmeal.id}")
+
+        # address lookup, savepoint, order insert, dishes, setmeals, bulk insert,
+        # savepoint release; the rollup is updated after commit
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(7):
+            response = self.submit()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["code"], 1)
+        order = Order.objects.get(id=response.data["data"]["id"])
+        self.assertEqual(len(order.number), NUMBER_WIDTH)
+        self.assertEqual(order.orderdetail_set.count(), len(self.dishes) + 1)
+        self.assertEqual(self.cart.items(), {})
+        self.assertEqual(len(InMemoryDelayedQueue(ORDER_CANCEL_QUEUE)), 1)
+        rollup = DailyRollup.objects.get(date=timezone.localdate())
+        self.assertEqual(rollup.order_count, 1)
+
+    def test_submit_with_missing_dish_leaves_no_order(self):
+        self.cart.add("dish_999999")
+
+        response = self.submit()
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderDetail.objects.exists())
+        self.assertIn("dish_999999", self.cart.items())
+
+    def test_submit_with_banned_setmeal_is_rejected(self):
+        self.cart.add(f"setmeal_{self.setmeal.id}")
+        Setmeal.objects.filter(id=self.setmeal.id).update(status=0)
+
+        response = self.submit()
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Order.objects.exists())
+
+    def test_submit_with_empty_cart_is_rejected(self):
+        response = self.submit()
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_submit_keeps_items_added_before_commit(self):
+        self.cart.add(f"dish_{self.dishes[0].id}")
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # added by another request while the order was being written
+        self.cart.add(f"dish_{self.dishes[1].id}")
+        for callback in callbacks:
+            callback()
+        self.assertEqual(list(self.cart.items()), [f"dish_{self.dishes[1].id}"])
+
+    def create_previous_order(self):
+        prev_order = create_order(
+            self.customer, self.address, "test_repetition", status=5
+        )
+        OrderDetail.objects.bulk_create(
+            [
+                OrderDetail(
+                    name=self.dishes[0].name,
+                    image_id=self.dishes[0].image_id,
+                    order_id=prev_order,
+                    dish_id=self.dishes[0],
+                    dish_flavor="辣",
+                    number=2,
+                    amount=10,
+                ),
+                OrderDetail(
+                    name=self.setmeal.name,
+                    image_id=self.setmeal.image_id,
+                    order_id=prev_order,
+                    setmeal_id=self.setmeal,
+                    number=1,
+                    amount=30,
+                ),
+            ]
+        )
+        return prev_order
+
+    def repeat(self, prev_order):
+        request = self.factory.post(
+            reverse("order_repetition", kwargs={"id": prev_order.id})
+        )
+        force_authenticate(request, user=self.customer)
+        return OrderRepetitionView.as_view()(request, id=prev_order.id)
+
+    def test_repetition_copies_lines_at_current_prices(self):
+        prev_order = self.create_previous_order()
+        Dish.objects.filter(id=self.dishes[0].id).update(price=12)
+
+        # order, details, dishes, setmeals, savepoint, order insert, bulk insert,
+        # savepoint release
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(8):
+            response = self.repeat(prev_order)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order = Order.objects.exclude(id=prev_order.id).get()
+        self.assertEqual(order.status, 1)
+        # 100 paid, 2 dishes now cost 2 more each
+        self.assertEqual(order.amount, 104)
+        self.assertEqual(
+            list(
+                order.orderdetail_set.order_by("id").values_list(
+                    "dish_id", "setmeal_id", "dish_flavor", "number", "amount"
+                )
+            ),
+            [
+                (self.dishes[0].id, None, "辣", 2, 12),
+                (None, self.setmeal.id, None, 1, 30),
+            ],
+        )
+        self.assertEqual(len(InMemoryDelayedQueue(ORDER_CANCEL_QUEUE)), 1)
+
+    def test_repetition_of_a_deleted_item_is_rejected(self):
+        prev_order = self.create_previous_order()
+        # the setmeal is deleted after the order lines are read
+        with mock.patch.object(Setmeal.objects, "in_bulk", return_value={}):
+            response = self.repeat(prev_order)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_repetition_of_another_customers_order_is_not_found(self):
+        prev_order = self.create_previous_order()
+        other, _ = create_customer_with_address("test_repetition_other")
+        request = self.factory.post(
+            reverse("order_repetition", kwargs={"id": prev_order.id})
+        )
+        force_authenticate(request, user=other)
+        response = OrderRepetitionView.as_view()(request, id=prev_order.id)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_repetition_of_a_banned_item_is_rejected(self):
+        prev_order = self.create_previous_order()
+        Dish.objects.filter(id=self.dishes[0].id).update(status=0)
+        response = self.repeat(prev_order)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+@override_settings(
+    DELAYED_QUEUE_BACKEND="applications.orders.delayed_jobs.InMemoryDelayedQueue",
+    ORDER_PAYMENT_TIMEOUT=timedelta(0),
+)
+class CancelUnpaidOrdersTests(APITestCase):
+
+    def setUp(self):
+        self.customer, self.address = create_customer_with_address(
+            "test_order_cancel"
+        )
+        self.queue = InMemoryDelayedQueue(ORDER_CANCEL_QUEUE)
+
+    def tearDown(self):
+        InMemoryDelayedQueue.clear()
+
+    def test_worker_cancels_only_unpaid_orders(self):
+        unpaid = [
+            create_order(self.customer, self.address, f"unpaid_{i}")
+            for i in range(5)
+        ]
+        paid = create_order(self.customer, self.address, "paid", status=2)
+        for order in [*unpaid, paid]:
+            self.queue.schedule(str(order.id), 0)
+
+        call_command(
+            "cancel_unpaid_orders", "--once", "--batch-size=2", stdout=StringIO()
+        )
+
+        self.assertEqual(Order.objects.filter(status=6).count(), len(unpaid))
+        paid.refresh_from_db()
+        self.assertEqual(paid.status, 2)
+        self.assertEqual(len(self.queue), 0)
+
+    def test_only_the_canceled_orders_are_announced(self):
+        unpaid = create_order(self.customer, self.address, "unpaid")
+        paid = create_order(self.customer, self.address, "paid", status=2)
+        canceled = create_order(self.customer, self.address, "canceled", status=6)
+        receiver = mock.Mock()
+        orders_transitioned.connect(receiver)
+        self.addCleanup(orders_transitioned.disconnect, receiver)
+
+        moved = cancel_unpaid_orders([unpaid.id, paid.id, canceled.id])
+
+        self.assertEqual(moved, 1)
+        lookup = receiver.call_args.kwargs["lookup"]
+        self.assertEqual(list(Order.objects.filter(**lookup)), [unpaid])
+
+    def test_leased_jobs_are_retried(self):
+        order = create_order(self.customer, self.address, "unpaid")
+        self.queue.schedule(str(order.id), 0)
+
+        self.assertEqual(self.queue.lease_due(10, 100, lease=30), [str(order.id)])
+        self.assertEqual(self.queue.lease_due(20, 100, lease=30), [])
+        self.assertEqual(self.queue.lease_due(40, 100, lease=30), [str(order.id)])
+
+
+class OrderTransitionTests(APITestCase):
+
+    def setUp(self):
+        self.customer, self.address = create_customer_with_address(
+            "test_order_transition"
+        )
+        self.order = create_order(self.customer, self.address, "transition")
+        self.factory = APIRequestFactory()
+
+    def test_payment_after_timeout_is_rejected(self):
+        self.assertTrue(transition_order("timeout", {"id": self.order.id}))
+
+        request = self.factory.put(
+            reverse("order_payment"),
+            {"orderNumber": self.order.number, "payMethod": 1},
+            format="json",
+        )
+        force_authenticate(request, user=self.customer)
+        response = OrderPaymentView.as_view()(request)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 6)
+        self.assertEqual(self.order.pay_status, 1)
+
+    def test_transition_of_unknown_order_is_not_found(self):
+        request = self.factory.put(reverse("order_cancel", kwargs={"id": 999999}))
+        force_authenticate(request, user=self.customer)
+        response = OrderCancelView.as_view()(request, id=999999)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_timeout_after_payment_is_ignored(self):
+        self.assertTrue(
+            transition_order("pay", {"id": self.order.id}, pay_method=1, pay_status=2)
+        )
+        self.assertFalse(transition_order("timeout", {"id": self.order.id}))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 2)
+        self.assertIsNone(self.order.cancel_time)
+
+    def test_confirm_is_a_single_conditional_update(self):
+        transition_order("pay", {"id": self.order.id}, pay_method=1, pay_status=2)
+        request = self.factory.put(
+            reverse("order_confirm"), {"id": self.order.id}, format="json"
+        )
+        force_authenticate(request, user=self.customer)
+        with self.assertNumQueries(1):
+            response = OrderComfirmView.as_view()(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 3)
+        self.assertIsNotNone(self.order.checkout_time)
+
+
+@override_settings(
+    ORDER_EVENTS_BACKEND="applications.orders.events.InMemoryEventBroker"
+)
+class OrderEventsTests(APITestCase):
+
+    def setUp(self):
+        self.customer, self.address = create_customer_with_address("test_order_event")
+        self.order = create_order(self.customer, self.address, "event")
+        self.factory = APIRequestFactory()
+
+    def console_scope(self, token):
+        cookie = f"{settings.REST_AUTH['JWT_AUTH_COOKIE']}={token}"
+        return {
+            "type": "websocket",
+            "path": "/ws/test",
+            "headers": [(b"cookie", cookie.encode())],
+        }
+
+    async def connect(self, scope):
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        await inbox.put({"type": "websocket.connect"})
+        connection = asyncio.create_task(
+            order_events_websocket(scope, inbox.get, outbox.put)
+        )
+        return inbox, outbox, connection
+
+    async def connect_and_publish(self, callbacks):
+        # the handshake authenticates in another thread, outside this test's
+        # transaction, so the employee lookup is stubbed here
+        with mock.patch(
+            "applications.orders.events.authenticate_console",
+            return_value=mock.sentinel.employee,
+        ):
+            inbox, outbox, connection = await self.connect(self.console_scope("x"))
+            self.assertEqual((await outbox.get())["type"], "websocket.accept")
+        while not len(hub):
+            await asyncio.sleep(0)
+        for callback in callbacks:
+            callback()
+        message = await asyncio.wait_for(outbox.get(), timeout=1)
+        await inbox.put({"type": "websocket.disconnect"})
+        await connection
+        return message
+
+    def test_reminder_is_pushed_to_connected_consoles(self):
+        request = self.factory.get(
+            reverse("order_reminder", kwargs={"id": self.order.id})
+        )
+        force_authenticate(request, user=self.customer)
+        # the event is published once the request commits
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = OrderReminderView.as_view()(request, id=self.order.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        message = asyncio.run(self.connect_and_publish(callbacks))
+        self.assertEqual(
+            json.loads(message["text"]),
+            {"type": 2, "orderId": self.order.id, "content": "订单号：event"},
+        )
+        self.assertEqual(len(hub), 0)
+
+    def test_reminder_for_another_customers_order_is_not_found(self):
+        other, _ = create_customer_with_address("test_order_event_other")
+        request = self.factory.get(
+            reverse("order_reminder", kwargs={"id": self.order.id})
+        )
+        force_authenticate(request, user=other)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = OrderReminderView.as_view()(request, id=self.order.id)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(callbacks, [])
+
+    def test_console_is_authenticated_by_the_admin_jwt_cookie(self):
+        employee = get_user_model().objects.create_user(
+            username="test_order_event_admin", password="testpassword"
+        )
+        token = str(RefreshToken.for_user(employee).access_token)
+        self.assertEqual(authenticate_console(self.console_scope(token)), employee)
+        self.assertIsNone(authenticate_console(self.console_scope("invalid")))
+        self.assertIsNone(authenticate_console({"type": "websocket", "headers": []}))
+
+    def test_unauthenticated_console_is_rejected(self):
+        async def connect():
+            _, outbox, connection = await self.connect(
+                {"type": "websocket", "path": "/ws/test", "headers": []}
+            )
+            await connection
+            return await outbox.get()
+
+        message = asyncio.run(connect())
+        self.assertEqual(message, {"type": "websocket.close", "code": 4401})
+        self.assertEqual(len(hub), 0)
+
+
+class ORJSONRendererTests(APITestCase):
+
+    def test_output_matches_json_renderer(self):
+        customer, address = create_customer_with_address("test_order_renderer")
+        order = create_order(customer, address, "renderer", remark="备注\u2028")
+        data = {
+            "order": OrderRrepresentationSerializer(order).data,
+            "amount": Decimal("12.50"),
+            "orderTime": order.order_time,
+            "empty": None,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class PaginationOrderHistoryViewTests(APITestCase):
+
+    def setUp(self):
+        self.customer, self.address = create_customer_with_address(
+            "test_order_history"
+        )
+        for i in range(25):
+            create_order(self.customer, self.address, f"history_{i}")
+        # ties on order_time must be broken by id
+        Order.objects.filter(id__lte=Order.objects.order_by("id")[10].id).update(
+            order_time=Order.objects.order_by("id")[0].order_time
+        )
+        self.factory = APIRequestFactory()
+        self.url = reverse("order_history")
+
+    def tearDown(self):
+        cache.delete(f"order_count_{self.customer.id}_None")
+
+    def get_page(self, query):
+        request = self.factory.get(self.url + query)
+        force_authenticate(request, user=self.customer)
+        return PaginationOrderHistoryView.as_view()(request).data["data"]
+
+    def test_cursor_pages_cover_all_orders_in_constant_queries(self):
+        page = self.get_page("?pageSize=10&cursor=")
+        self.assertEqual(page["total"], 25)
+        ids = [record["id"] for record in page["records"]]
+        while page["nextCursor"]:
+            # order page and its details, total served from cache
+            with self.assertNumQueries(2):
+                page = self.get_page(f"?pageSize=10&cursor={page['nextCursor']}")
+            ids += [record["id"] for record in page["records"]]
+
+        expected = Order.objects.order_by("-order_time", "-id")
+        self.assertEqual(ids, list(expected.values_list("id", flat=True)))
+
+    def test_page_number_mode_counts_once(self):
+        # count, page, details
+        with self.assertNumQueries(3):
+            page = self.get_page("?pageSize=10&page=2")
+        self.assertEqual(page["total"], 25)
+        self.assertEqual(len(page["records"]), 10)
+
+    def test_invalid_cursor(self):
+        request = self.factory.get(self.url + "?pageSize=10&cursor=bad")
+        force_authenticate(request, user=self.customer)
+        response = PaginationOrderHistoryView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QueryOrderStatisticsViewTests(APITestCase):
+
+    def setUp(self):
+        cache.delete(ORDER_STATUS_COUNTS_KEY)
+        self.customer, self.address = create_customer_with_address(
+            "test_order_statistics"
+        )
+        self.orders = [
+            create_order(self.customer, self.address, f"statistics_{i}", status=2)
+            for i in range(3)
+        ]
+        self.factory = APIRequestFactory()
+
+    def tearDown(self):
+        cache.delete(ORDER_STATUS_COUNTS_KEY)
+
+    def get_statistics(self):
+        request = self.factory.get(reverse("order_statistics"))
+        force_authenticate(request, user=self.customer)
+        return QueryOrderStatisticsView.as_view()(request).data["data"]
+
+    def test_counters_follow_transitions_without_queries(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_statistics()["toBeConfirmed"], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_order("confirm", {"id": self.orders[0].id})
+            transition_order("cancel", {"id": self.orders[1].id})
+
+        with self.assertNumQueries(0):
+            statistics = self.get_statistics()
+        self.assertEqual(
+            statistics, {"toBeConfirmed": 1, "confirmed": 1, "deliveryInProgress": 0}
+        )
+
+
+class OrderNumberGeneratorTests(APITestCase):
+    NOW_NS = 1_800_000_000_000_000_000
+
+    def frozen_clock(self, now_ns=NOW_NS):
+        return mock.patch(
+            "applications.orders.numbers.time.time_ns", return_value=now_ns
+        )
+
+    def split(self, _id):
+        """(milliseconds, worker id, sequence) of an id."""
+        return (
+            _id >> (WORKER_ID_BITS + SEQUENCE_BITS),
+            (_id >> SEQUENCE_BITS) & MAX_WORKER_ID,
+            _id & MAX_SEQUENCE,
+        )
+
+    def test_ids_increase_within_a_millisecond(self):
+        generator = OrderNumberGenerator(3)
+        with self.frozen_clock():
+            ids = [generator.next_id() for _ in range(5)]
+        first_ms = self.split(ids[0])[0]
+        self.assertEqual(
+            [self.split(_id) for _id in ids],
+            [(first_ms, 3, sequence) for sequence in range(5)],
+        )
+        self.assertEqual(len(generator.next_number()), NUMBER_WIDTH)
+
+    def test_sequence_overflow_rolls_into_the_next_millisecond(self):
+        generator = OrderNumberGenerator(3)
+        with self.frozen_clock():
+            ids = [generator.next_id() for _ in range(MAX_SEQUENCE + 2)]
+        self.assertEqual(ids, sorted(set(ids)))
+        first_ms = self.split(ids[0])[0]
+        self.assertEqual(self.split(ids[-2]), (first_ms, 3, MAX_SEQUENCE))
+        self.assertEqual(self.split(ids[-1]), (first_ms + 1, 3, 0))
+
+    def test_ids_keep_increasing_when_the_clock_steps_back(self):
+        generator = OrderNumberGenerator(3)
+        with self.frozen_clock():
+            first = generator.next_id()
+        with self.frozen_clock(self.NOW_NS - 5_000_000_000):
+            second = generator.next_id()
+        self.assertGreater(second, first)
+        self.assertEqual(self.split(second)[0], self.split(first)[0])
+
+    def test_ids_are_unique_across_workers(self):
+        generators = [OrderNumberGenerator(worker_id) for worker_id in range(50)]
+        with self.frozen_clock():
+            ids = [generator.next_id() for _ in range(100) for generator in generators]
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_worker_lease_is_renewed_or_replaced(self):
+        redis = get_redis_connection("default")
+        self.addCleanup(
+            redis.delete,
+            *(_lease_key(worker_id) for worker_id in range(MAX_WORKER_ID + 1)),
+        )
+        first, second = OrderNumberGenerator(), OrderNumberGenerator()
+        first.next_id()
+        second.next_id()
+        self.assertNotEqual(first.worker_id, second.worker_id)
+        leased_worker_id = first.worker_id
+
+        # renewed once due
+        redis.expire(_lease_key(leased_worker_id), 10)
+        first._renew_at_ms = 0
+        first.next_id()
+        self.assertEqual(first.worker_id, leased_worker_id)
+        self.assertGreater(redis.ttl(_lease_key(leased_worker_id)), 10)
+
+        # lost while the generator sat idle: a free worker id is leased
+        redis.set(_lease_key(leased_worker_id), "taken")
+        first._renew_at_ms = 0
+        first.next_id()
+        self.assertNotIn(first.worker_id, (leased_worker_id, second.worker_id))
+
+    @skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_forked_process_drops_the_parent_worker_id(self):
+        generator = OrderNumberGenerator(3)
+        generator.next_id()
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write_end, repr(generator.worker_id).encode())
+            os._exit(0)
+        os.close(write_end)
+        os.waitpid(pid, 0)
+        with os.fdopen(read_end) as pipe:
+            self.assertEqual(pipe.read(), "None")
+        self.assertEqual(generator.worker_id, 3)
+
+
+@skipUnless(connection.vendor == "sqlite", "bench only runs on SQLite")
+@override_settings(
+    DELAYED_QUEUE_BACKEND="applications.orders.delayed_jobs.InMemoryDelayedQueue",
+    ORDER_EVENTS_BACKEND="applications.orders.events.InMemoryEventBroker",
+)
+class BenchCommandTests(APITestCase):
+
+    def tearDown(self):
+        InMemoryDelayedQueue.clear()
+
+    def test_bench_drives_every_flow_and_saves_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "bench.json")
+            call_command(
+                "bench",
+                "--dishes=20",
+                "--setmeals=4",
+                "--customers=3",
+                "--requests=3",
+                f"--output={output}",
+                stdout=StringIO(),
+            )
+            with open(output) as file:
+                flows = json.load(file)["flows"]
+
+        self.assertEqual(list(flows), list(FLOWS))
+        self.assertEqual(flows["cart_add"]["requests"], 6)
+        self.assertEqual(flows["order_submit"]["requests"], 3)
+        self.assertGreater(flows["order_submit"]["queries_per_request"], 0)
@@ -0,0 +1,69 @@
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from applications.instrumentation import record_order_transition
+
+from .counters import record_transition
+from .models import Order
+from .signals import orders_transitioned
+
+UNPAID, UNACCEPTED, ACCEPTED, DISTRIBUTING, COMPLETED, CANCELED = range(1, 7)
+
+# action: (statuses the order may be in, status it moves to)
+ORDER_TRANSITIONS = {
+    "pay": ((UNPAID,), UNACCEPTED),
+    "confirm": ((UNACCEPTED,), ACCEPTED),
+    "reject": ((UNACCEPTED,), CANCELED),
+    "deliver": ((ACCEPTED,), DISTRIBUTING),
+    "complete": ((DISTRIBUTING,), COMPLETED),
+    "cancel": ((UNPAID, UNACCEPTED, ACCEPTED), CANCELED),
+    "timeout": ((UNPAID,), CANCELED),
+}
+
+# columns stamped with the transition time
+TRANSITION_TIME_FIELDS = {
+    "confirm": "checkout_time",
+    "reject": "cancel_time",
+    "deliver": "delivery_time",
+    "cancel": "cancel_time",
+    "timeout": "cancel_time",
+}
+
+
+def transition_orders(action, lookup, **changes):
+    """
+    Move every order matching ``lookup`` that is allowed to take ``action``.
+
+    Each change is an ``UPDATE ... WHERE <lookup> AND status = <source>``
+    writing only the status and ``changes``, so concurrent transitions of the
+    same order can never overwrite each other. Actions with several source
+    statuses issue one update per source, which tells the status counters
+    exactly where the orders came from. Moved orders are announced through
+    ``orders_transitioned``, whose receivers may read the orders matching
+    ``lookup``, so it must only match the orders being moved. Returns the
+    number of orders moved.
+    """
+    sources, target = ORDER_TRANSITIONS[action]
+    if time_field := TRANSITION_TIME_FIELDS.get(action):
+        changes.setdefault(time_field, timezone.now())
+    moved = 0
+    for source in sources:
+        count = Order.objects.filter(status=source, **lookup).update(
+            status=target, **changes
+        )
+        if count:
+            record_transition(source, target, count)
+            transaction.on_commit(
+                partial(record_order_transition, source, target, count)
+            )
+            moved += count
+    if moved:
+        orders_transitioned.send(sender=Order, target=target, lookup=lookup)
+    return moved
+
+
+def transition_order(action, lookup, **changes):
+    """Return whether the single order matching ``lookup`` took ``action``."""
+    return transition_orders(action, lookup, **changes) == 1
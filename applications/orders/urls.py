@@ -8,6 +8,7 @@ from .views import (
     OrderDeliveryView,
     OrderPaymentView,
     OrderRejectView,
+    OrderReminderView,
     OrderRepetitionView,
     PaginationOrderByConditionView,
     PaginationOrderHistoryView,
@@ -24,6 +25,7 @@ urlpatterns = [
     path("order/complete/<int:id>", OrderCompleteView.as_view(), name="order_complete"),
     path("order/cancel/<int:id>", OrderCancelView.as_view(), name="order_cancel"),
     path("order/details/<int:id>", QueryOrderByIDView.as_view(), name="order_query"),
+    path("order/reminder/<int:id>", OrderReminderView.as_view(), name="order_reminder"),
     path(
         "order/orderDetail/<int:id>", QueryOrderByIDView.as_view(), name="order_query"
     ),
@@ -1,25 +1,72 @@
 import logging
-import time
-from datetime import datetime
-from django.conf import settings
-from django.core.cache import cache
+from django.db import transaction
 from rest_framework import permissions
 from rest_framework.views import APIView
-from rocketmq.client import Message, Producer
 
-from applications.exceptions import KeyMissingException
+from applications.caching import get_or_compute
+from applications.customers.cart import ShoppingCart
+from applications.exceptions import (
+    EmptyCartException,
+    ItemUnavailableException,
+    KeyMissingException,
+    OrderNotFoundException,
+    OrderStatusConflictException,
+)
 from applications.meals.models import Dish, Setmeal
-from applications.utils import get_custom_pagination, standard_response
+from applications.utils import (
+    KeysetPagination,
+    get_custom_pagination,
+    standard_response,
+)
 
+from .counters import get_status_counts, record_order_created
+from .delayed_jobs import schedule_order_cancel
+from .events import ORDER_PAID_EVENT, ORDER_REMINDER_EVENT, publish_order_event
 from .models import Order, OrderDetail
+from .numbers import next_order_number
+from .signals import order_created
 from .serializers import (
     OrderCreationSerializer,
     OrderRrepresentationSerializer,
     OrderRrepresentationSerializer2,
 )
+from .transitions import transition_order
 
 logger = logging.getLogger(__name__)
 
+ORDER_COUNT_TIMEOUT = 60
+
+
+def apply_transition(action, lookup, **changes):
+    """
+    Move the order matching ``lookup``; unknown orders answer 404 and orders
+    whose status does not allow ``action`` 409.
+    """
+    if transition_order(action, lookup, **changes):
+        return
+    if not Order.objects.filter(**lookup).exists():
+        raise OrderNotFoundException()
+    raise OrderStatusConflictException()
+
+
+def paginate_orders(request, queryset, page_size, count_key):
+    """
+    Paginate ``queryset`` by page number, or by keyset when the request has a
+    ``cursor`` query param (empty for the first page).
+
+    In keyset mode the total is cached under ``count_key`` for a short while
+    instead of being counted on every page.
+    """
+    if KeysetPagination.cursor_query_param in request.query_params:
+        paginator = KeysetPagination(page_size, "order_time")
+        result_page = paginator.paginate_queryset(queryset, request)
+        total = get_or_compute(count_key, queryset.count, ORDER_COUNT_TIMEOUT)
+        return result_page, {"total": total, "nextCursor": paginator.next_cursor}
+
+    paginator = get_custom_pagination(page_size)
+    result_page = paginator.paginate_queryset(queryset, request)
+    return result_page, {"total": paginator.page.paginator.count}
+
 
 class OrderCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -28,51 +75,68 @@ class OrderCreateView(APIView):
         serializer = OrderCreationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         validated_data = serializer.validated_data
-        curr_time = str(time.time()).replace(".", "")
-        order_number = f"{curr_time}{request.user.id}"
-        created_order = Order.objects.create(
-            **validated_data,
-            user_id=request.user,
-            number=order_number,
-            phone=validated_data["address_book_id"].phone,
-            address=str(validated_data["address_book_id"]),
-            user_name=request.user.name,
-            consignee=validated_data["address_book_id"].consignee,
-        )
-        cart_items = cache.get(f"cart_{request.user.id}")
-        cache.delete(f"cart_{request.user.id}")
+        cart = ShoppingCart(request.user.id)
+        cart_items = cart.items()
+        if not cart_items:
+            raise EmptyCartException()
+        order_number = next_order_number()
+
+        dish_lines, setmeal_lines = [], []
         for key, value in cart_items.items():
             match key.split("_"):
                 case ["dish", dish_id, *_]:
-                    dish = Dish.objects.get(id=dish_id)
-                    OrderDetail.objects.create(
+                    dish_lines.append((int(dish_id), value["number"]))
+                case ["setmeal", setmeal_id, *_]:
+                    setmeal_lines.append((int(setmeal_id), value["number"]))
+
+        with transaction.atomic():
+            created_order = Order.objects.create(
+                **validated_data,
+                user_id=request.user,
+                number=order_number,
+                phone=validated_data["address_book_id"].phone,
+                address=str(validated_data["address_book_id"]),
+                user_name=request.user.name,
+                consignee=validated_data["address_book_id"].consignee,
+            )
+            dishes = Dish.objects.in_bulk([_id for _id, _ in dish_lines])
+            setmeals = Setmeal.objects.in_bulk([_id for _id, _ in setmeal_lines])
+            order_details = []
+            for dish_id, number in dish_lines:
+                dish = dishes.get(dish_id)
+                # deleted since, or taken off the menu
+                if dish is None or dish.status == 0:
+                    raise ItemUnavailableException()
+                order_details.append(
+                    OrderDetail(
                         name=dish.name,
-                        image=dish.image,
+                        image_id=dish.image_id,
                         order_id=created_order,
                         dish_id=dish,
-                        number=value["number"],
+                        number=number,
                         amount=dish.price,
                     )
-                case ["setmeal", setmeal_id, *_]:
-                    setmeal = Setmeal.objects.get(id=setmeal_id)
-                    OrderDetail.objects.create(
+                )
+            for setmeal_id, number in setmeal_lines:
+                setmeal = setmeals.get(setmeal_id)
+                if setmeal is None or setmeal.status == 0:
+                    raise ItemUnavailableException()
+                order_details.append(
+                    OrderDetail(
                         name=setmeal.name,
-                        image=setmeal.image,
+                        image_id=setmeal.image_id,
                         order_id=created_order,
                         setmeal_id=setmeal,
-                        number=value["number"],
+                        number=number,
                         amount=setmeal.price,
                     )
-
-        # producer = Producer('PID_order')
-        # producer.set_name_server_address(settings.ROCKETMQ_NAME_SERVER)
-        # producer.start()
-        # msg = Message('OrderCancel')
-        # msg.set_keys(order_number)
-        # msg.set_body(str(created_order.id))
-        # msg.set_delay_time_level(14)
-        # producer.send_sync(msg)
-        # producer.shutdown()
+                )
+            OrderDetail.objects.bulk_create(order_details)
+            record_order_created()
+            order_created.send(sender=Order, order=created_order)
+            # only the items ordered, one added meanwhile stays in the cart
+            transaction.on_commit(lambda: cart.discard(list(cart_items)))
+            transaction.on_commit(lambda: schedule_order_cancel(created_order))
 
         return standard_response(
             True,
@@ -92,16 +156,18 @@ class OrderPaymentView(APIView):
     def put(self, request):
         order_number = request.data.get("orderNumber")
         pay_method = request.data.get("payMethod")
-        order = Order.objects.get(number=order_number)
-        order.pay_method = pay_method
-        order.status = 2  # unaccepted
-        order.pay_status = 2  # paid
-        order.save()
+        apply_transition(
+            "pay", {"number": order_number}, pay_method=pay_method, pay_status=2
+        )
+        order_id, estimated_delivery_time = Order.objects.values_list(
+            "id", "estimated_delivery_time"
+        ).get(number=order_number)
+        publish_order_event(ORDER_PAID_EVENT, order_id, order_number)
 
         return standard_response(
             True,
             "Order paid successfully",
-            {"estimatedDeliveryTime": order.estimated_delivery_time},
+            {"estimatedDeliveryTime": estimated_delivery_time},
         )
 
 
@@ -118,6 +184,22 @@ class QueryOrderByIDView(APIView):
         )
 
 
+class OrderReminderView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        _id = self.kwargs.get("id", None)
+        order_number = (
+            Order.objects.filter(id=_id, user_id=request.user)
+            .values_list("number", flat=True)
+            .first()
+        )
+        if order_number is None:
+            raise OrderNotFoundException()
+        publish_order_event(ORDER_REMINDER_EVENT, _id, order_number)
+        return standard_response(True, "Order reminder sent successfully", {})
+
+
 class PaginationOrderHistoryView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -128,19 +210,24 @@ class PaginationOrderHistoryView(APIView):
         if not page_size:
             raise KeyMissingException(key_name="pageSize", position="query params")
 
-        paginator = get_custom_pagination(page_size)
-        queryset = Order.objects.filter(user_id=request.user).order_by("-order_time")
+        queryset = (
+            Order.objects.filter(user_id=request.user)
+            .order_by("-order_time")
+            .prefetch_related("orderdetail_set")
+        )
 
         if _status:
             queryset = queryset.filter(status=_status)
 
-        result_page = paginator.paginate_queryset(queryset, request)
+        result_page, page_data = paginate_orders(
+            request, queryset, page_size, f"order_count_{request.user.id}_{_status}"
+        )
 
         return standard_response(
             True,
             "Successfully fetched setmeal",
             {
-                "total": queryset.count(),
+                **page_data,
                 "records": OrderRrepresentationSerializer(result_page, many=True).data,
             },
         )
@@ -151,22 +238,17 @@ class OrderCancelView(APIView):
 
     def put(self, request, *args, **kwargs):
         _id = self.kwargs.get("id", None)
-        order = Order.objects.get(id=_id)
-        order.status = 6
-        order.cancel_time = datetime.now()
-        order.save()
+        apply_transition("cancel", {"id": _id})
 
         return standard_response(True, "Order canceled successfully", {})
 
+
 class OrderComfirmView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def put(self, request, *args, **kwargs):
         _id = request.data.get("id", None)
-        order = Order.objects.get(id=_id)
-        order.status = 3
-        order.checkout_time = datetime.now()
-        order.save()
+        apply_transition("confirm", {"id": _id})
 
         return standard_response(True, "Order confirmed successfully", {})
 
@@ -177,10 +259,7 @@ class OrderRejectView(APIView):
     def put(self, request, *args, **kwargs):
         _id = request.data.get("id", None)
         rejection_reason = request.data.get("rejectionReason")
-        order = Order.objects.get(id=_id)
-        order.status = 1
-        order.rejection_reason = rejection_reason
-        order.save()
+        apply_transition("reject", {"id": _id}, rejection_reason=rejection_reason)
 
         return standard_response(True, "Order rejected successfully", {})
 
@@ -190,62 +269,85 @@ class OrderDeliveryView(APIView):
 
     def put(self, request, *args, **kwargs):
         _id = self.kwargs.get("id", None)
-        order = Order.objects.get(id=_id)
-        order.status = 4
-        order.delivery_time = datetime.now()
-        order.save()
+        apply_transition("deliver", {"id": _id})
 
         return standard_response(True, "Order delivery successfully", {})
 
+
 class OrderCompleteView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def put(self, request, *args, **kwargs):
         _id = self.kwargs.get("id", None)
-        order = Order.objects.get(id=_id)
-        order.status = 5
-        order.save()
+        apply_transition("complete", {"id": _id})
 
         return standard_response(True, "Order completed successfully", {})
 
+
 class OrderRepetitionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
         _id = self.kwargs.get("id", None)
-        prev_order = Order.objects.get(id=_id)
-        order_number = f"{str(time.time()).replace(".", "")}{request.user.id}"
-        created_order = Order.objects.create(
-            number=order_number,
-            status=1,
-            user_id=request.user,
-            address_book_id=prev_order.address_book_id,
-            order_time=datetime.now(),
-            amount=prev_order.amount,
-            phone=prev_order.phone,
-            address=prev_order.address,
-            user_name=prev_order.user_name,
-            consignee=prev_order.consignee,
-            estimated_delivery_time=prev_order.estimated_delivery_time,
-            delivery_status=prev_order.delivery_status,
-            pack_amount=prev_order.pack_amount,
-            tableware_number=prev_order.tableware_number,
-            tableware_status=prev_order.tableware_status,
-            pay_method=prev_order.pay_method,
-            remark=prev_order.remark,
+        prev_order = Order.objects.filter(id=_id, user_id=request.user).first()
+        if prev_order is None:
+            raise OrderNotFoundException()
+        prev_details = OrderDetail.objects.filter(order_id=prev_order).values_list(
+            "dish_id", "setmeal_id", "dish_flavor", "number", "amount"
+        )
+        dishes = Dish.objects.in_bulk(
+            {dish_id for dish_id, *_ in prev_details if dish_id}
         )
-        order_details = OrderDetail.objects.filter(order_id=prev_order)
-        for order_detail in order_details:
-            OrderDetail.objects.create(
-                name=order_detail.name,
-                image=order_detail.image,
-                order_id=created_order,
-                dish_id=order_detail.dish_id,
-                setmeal_id=order_detail.setmeal_id,
-                dish_flavor=order_detail.dish_flavor,
-                number=order_detail.number,
-                amount=order_detail.amount,
+        setmeals = Setmeal.objects.in_bulk(
+            {setmeal_id for _, setmeal_id, *_ in prev_details if setmeal_id}
+        )
+
+        # same lines at today's prices, the fees stay as they were
+        amount = prev_order.amount
+        lines = []
+        for dish_id, setmeal_id, dish_flavor, number, prev_price in prev_details:
+            item = dishes.get(dish_id) if dish_id else setmeals.get(setmeal_id)
+            # deleted since, or taken off the menu
+            if item is None or item.status == 0:
+                raise ItemUnavailableException()
+            amount += (item.price - prev_price) * number
+            lines.append((item, dish_flavor, number))
+
+        with transaction.atomic():
+            created_order = Order.objects.create(
+                number=next_order_number(),
+                status=1,
+                user_id=request.user,
+                address_book_id_id=prev_order.address_book_id_id,
+                amount=amount,
+                phone=prev_order.phone,
+                address=prev_order.address,
+                user_name=prev_order.user_name,
+                consignee=prev_order.consignee,
+                estimated_delivery_time=prev_order.estimated_delivery_time,
+                delivery_status=prev_order.delivery_status,
+                pack_amount=prev_order.pack_amount,
+                tableware_number=prev_order.tableware_number,
+                tableware_status=prev_order.tableware_status,
+                pay_method=prev_order.pay_method,
+                remark=prev_order.remark,
             )
+            OrderDetail.objects.bulk_create(
+                OrderDetail(
+                    name=item.name,
+                    image_id=item.image_id,
+                    order_id=created_order,
+                    dish_id=item if isinstance(item, Dish) else None,
+                    setmeal_id=item if isinstance(item, Setmeal) else None,
+                    dish_flavor=dish_flavor,
+                    number=number,
+                    amount=item.price,
+                )
+                for item, dish_flavor, number in lines
+            )
+            record_order_created()
+            order_created.send(sender=Order, order=created_order)
+            transaction.on_commit(lambda: schedule_order_cancel(created_order))
         return standard_response(True, "Order created successfully", {})
 
 
@@ -262,8 +364,11 @@ class PaginationOrderByConditionView(APIView):
         if not page_size:
             raise KeyMissingException(key_name="pageSize", position="query params")
 
-        paginator = get_custom_pagination(page_size)
-        queryset = Order.objects.all().order_by("-order_time")
+        queryset = (
+            Order.objects.all()
+            .order_by("-order_time")
+            .prefetch_related("orderdetail_set")
+        )
 
         if _status:
             queryset = queryset.filter(status=_status)
@@ -272,12 +377,14 @@ class PaginationOrderByConditionView(APIView):
         if phone:
             queryset = queryset.filter(phone=phone)
 
-        result_page = paginator.paginate_queryset(queryset, request)
+        result_page, page_data = paginate_orders(
+            request, queryset, page_size, f"order_count_{_status}_{number}_{phone}"
+        )
         return standard_response(
             True,
             "Successfully fetched setmeal",
             {
-                "total": queryset.count(),
+                **page_data,
                 "records": OrderRrepresentationSerializer2(result_page, many=True).data,
             },
         )
@@ -287,17 +394,14 @@ class QueryOrderStatisticsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        to_be_confirmed_count = Order.objects.filter(status=2).count()
-        confirmed_count = Order.objects.filter(status=3).count()
-        delivery_in_progress_count = Order.objects.filter(status=4).count()
+        status_counts = get_status_counts()
 
         return standard_response(
             True,
             "Successfully fetched setmeal",
             {
-                "toBeConfirmed": to_be_confirmed_count,
-                "confirmed": confirmed_count,
-                "deliveryInProgress": delivery_in_progress_count,
+                "toBeConfirmed": status_counts.get(2, 0),
+                "confirmed": status_counts.get(3, 0),
+                "deliveryInProgress": status_counts.get(4, 0),
             },
         )
-
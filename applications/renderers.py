@@ -0,0 +1,29 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+# JavaScript does not accept these separators unescaped in strings
+LINE_SEPARATOR, PARAGRAPH_SEPARATOR = "\u2028".encode(), "\u2029".encode()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer producing the same compact UTF-8 output through orjson.
+
+    Datetimes are encoded by orjson itself; Decimal and the other types orjson
+    does not know fall back to DRF's encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+        )
+        return ret.replace(LINE_SEPARATOR, b"\\u2028").replace(
+            PARAGRAPH_SEPARATOR, b"\\u2029"
+        )
@@ -0,0 +1,7 @@
+from django.contrib import admin
+
+from .models import DailyRollup
+
+# Register your models here.
+
+admin.site.register(DailyRollup)
@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_save
+
+
+class ReportsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "applications.reports"
+
+    def ready(self):
+        from applications.orders.signals import order_created, orders_transitioned
+
+        from . import receivers
+
+        order_created.connect(receivers.order_created)
+        orders_transitioned.connect(receivers.orders_transitioned)
+        post_save.connect(
+            receivers.customer_saved, sender="customers.WechatCostomer"
+        )
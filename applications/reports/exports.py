@@ -0,0 +1,98 @@
+import csv
+from datetime import datetime, time, timedelta
+
+import xlsxwriter
+from django.utils import timezone
+
+from applications.orders.models import Order, OrderDetail
+
+EXPORT_FILE_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+EXPORT_DAYS = 30
+# rows fetched per query; mysqlclient buffers whole result sets client side,
+# so memory is only bounded by fetching keyset chunks
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = (
+    ("Order number", "order_id__number"),
+    ("Order time", "order_id__order_time"),
+    ("Status", "order_id__status"),
+    ("Consignee", "order_id__consignee"),
+    ("Phone", "order_id__phone"),
+    ("Address", "order_id__address"),
+    ("Item", "name"),
+    ("Number", "number"),
+    ("Item amount", "amount"),
+    ("Order amount", "order_id__amount"),
+)
+
+
+def get_default_export_range():
+    """The documented export covers the 30 days before today."""
+    end = timezone.localdate() - timedelta(days=1)
+    return end - timedelta(days=EXPORT_DAYS - 1), end
+
+
+def get_export_filename(begin, end, file_type):
+    return f"business_data_{begin}_{end}.{file_type}"
+
+
+def iter_export_rows(begin, end):
+    """Yield the header and one row per order item, ``EXPORT_CHUNK_SIZE`` at a time."""
+    yield [title for title, _ in EXPORT_COLUMNS]
+
+    start = timezone.make_aware(datetime.combine(begin, time.min))
+    stop = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    statuses = dict(Order._meta.get_field("status").choices)
+    details = OrderDetail.objects.filter(
+        order_id__order_time__gte=start, order_id__order_time__lt=stop
+    ).order_by("id")
+    fields = ("id", *(field for _, field in EXPORT_COLUMNS))
+    last_id = 0
+    while True:
+        chunk = list(
+            details.filter(id__gt=last_id).values_list(*fields)[:EXPORT_CHUNK_SIZE]
+        )
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+        for _, number, order_time, status, *rest, item_amount, order_amount in chunk:
+            yield [
+                number,
+                timezone.localtime(order_time).strftime("%Y-%m-%d %H:%M:%S"),
+                statuses.get(status, status),
+                *rest,
+                str(item_amount),
+                str(order_amount),
+            ]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Yield each row as a CSV line, with a BOM so Excel detects UTF-8."""
+    writer = csv.writer(_Echo())
+    yield "\ufeff"
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_csv(rows, file):
+    file.writelines(line.encode() for line in stream_csv(rows))
+
+
+def write_xlsx(rows, file):
+    """Write the rows to ``file``, flushing each row to a temp file as it goes."""
+    workbook = xlsxwriter.Workbook(file, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("Business data")
+    for row_number, row in enumerate(rows):
+        worksheet.write_row(row_number, 0, row)
+    workbook.close()
+
+
+EXPORT_WRITERS = {"csv": write_csv, "xlsx": write_xlsx}
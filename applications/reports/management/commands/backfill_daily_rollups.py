@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from applications.customers.models import WechatCostomer
+from applications.orders.models import Order
+from applications.reports.rankings import rebuild_rankings
+from applications.reports.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily report rollups and sales rankings from orders and "
+        "customers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--begin", type=date.fromisoformat, help="Defaults to the first record"
+        )
+        parser.add_argument(
+            "--end", type=date.fromisoformat, help="Defaults to today"
+        )
+        parser.add_argument("--chunk-days", type=int, default=30)
+
+    def handle(self, *args, **options):
+        begin = options["begin"] or self.first_day()
+        end = options["end"] or timezone.localdate()
+        if begin is None:
+            self.stdout.write(self.style.WARNING("Nothing to backfill"))
+            return
+
+        chunk = timedelta(days=options["chunk_days"])
+        while begin <= end:
+            chunk_end = min(begin + chunk - timedelta(days=1), end)
+            with transaction.atomic():
+                days = rebuild_rollups(begin, chunk_end)
+            rebuild_rankings(
+                begin + timedelta(days=n) for n in range((chunk_end - begin).days + 1)
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"{begin} - {chunk_end}: {days} days with data")
+            )
+            begin = chunk_end + timedelta(days=1)
+
+    def first_day(self):
+        first_times = [
+            Order.objects.aggregate(first=Min("order_time"))["first"],
+            WechatCostomer.objects.aggregate(first=Min("create_time"))["first"],
+        ]
+        first_times = [first for first in first_times if first is not None]
+        return timezone.localdate(min(first_times)) if first_times else None
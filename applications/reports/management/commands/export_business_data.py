@@ -0,0 +1,52 @@
+import os
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.reports.exports import (
+    EXPORT_FILE_TYPES,
+    EXPORT_WRITERS,
+    get_default_export_range,
+    get_export_filename,
+    iter_export_rows,
+)
+
+EXPORT_DIR = "reports"
+
+
+class Command(BaseCommand):
+    help = "Write the business data export into MEDIA_ROOT"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--begin", type=date.fromisoformat, help="Defaults to 30 days ago"
+        )
+        parser.add_argument(
+            "--end", type=date.fromisoformat, help="Defaults to yesterday"
+        )
+        parser.add_argument(
+            "--file-type", choices=EXPORT_FILE_TYPES.keys(), default="xlsx"
+        )
+
+    def handle(self, *args, **options):
+        default_begin, default_end = get_default_export_range()
+        begin = options["begin"] or default_begin
+        end = options["end"] or default_end
+        if begin > end:
+            raise CommandError("--begin must not be after --end")
+
+        file_type = options["file_type"]
+        filename = get_export_filename(begin, end, file_type)
+        directory = os.path.join(settings.MEDIA_ROOT, EXPORT_DIR)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, filename)
+        # write next to the target and rename, so readers never see a partial file
+        partial_path = f"{path}.partial"
+        with open(partial_path, "wb") as file:
+            EXPORT_WRITERS[file_type](iter_export_rows(begin, end), file)
+        os.replace(partial_path, path)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Exported {settings.MEDIA_URL}{EXPORT_DIR}/{filename}")
+        )
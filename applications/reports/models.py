@@ -0,0 +1,14 @@
+from django.db import models
+
+# Create your models here.
+
+
+class DailyRollup(models.Model):
+    date = models.DateField(unique=True)
+    turnover = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+    valid_order_count = models.IntegerField(default=0)
+    new_user_count = models.IntegerField(default=0)
+
+    def __str__(self) -> str:
+        return str(self.date)
@@ -0,0 +1,161 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django_redis import get_redis_connection
+
+from applications.orders.models import OrderDetail
+
+from .models import DailyRollup
+
+# one sorted set per day: member is the item name, score the number sold
+SALES_RANKING_KEY = "sales_ranking_{day}"
+# bumped by every increment, so a rebuild can tell it raced with one
+SALES_RANKING_VERSION_KEY = "sales_ranking_version_{day}"
+# rankings not rebuilt for a week are dropped, and rebuilt when next read
+SALES_RANKING_TIMEOUT = 7 * 24 * 60 * 60
+REBUILD_ATTEMPTS = 3
+
+# KEYS[1]: day ranking, KEYS[2]: its version,
+# ARGV[1]: version timeout, then pairs of item name and number sold
+INCREMENT_RANKING_SCRIPT = """
+redis.call("INCR", KEYS[2])
+redis.call("EXPIRE", KEYS[2], ARGV[1])
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call("ZINCRBY", KEYS[1], ARGV[i + 1], ARGV[i])
+end
+return 1
+"""
+
+# KEYS[1]: rebuilt ranking, KEYS[2]: day ranking, KEYS[3]: its version,
+# ARGV[1]: version read before the rebuild
+REPLACE_RANKING_SCRIPT = """
+if (redis.call("GET", KEYS[3]) or "0") ~= ARGV[1] then
+    redis.call("DEL", KEYS[1])
+    return 0
+end
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    redis.call("RENAME", KEYS[1], KEYS[2])
+else
+    redis.call("DEL", KEYS[2])
+end
+return 1
+"""
+
+increment_ranking = get_redis_connection("default").register_script(
+    INCREMENT_RANKING_SCRIPT
+)
+replace_ranking = get_redis_connection("default").register_script(
+    REPLACE_RANKING_SCRIPT
+)
+
+
+def _ranking_key(day):
+    return cache.make_key(SALES_RANKING_KEY.format(day=day))
+
+
+def _version_key(day):
+    return cache.make_key(SALES_RANKING_VERSION_KEY.format(day=day))
+
+
+def _daily_sales(**lookup):
+    """Return ``{day: {name: number}}`` of the completed orders matching lookup."""
+    rows = (
+        OrderDetail.objects.filter(order_id__status=5, **lookup)
+        .annotate(day=TruncDate("order_id__order_time"))
+        .values("day", "name")
+        .annotate(number=Sum("number"))
+    )
+    sales = {}
+    for row in rows:
+        sales.setdefault(row["day"], {})[row["name"]] = row["number"]
+    return sales
+
+
+def add_completed_orders_to_ranking(lookup):
+    """Add the items of the completed orders matching ``lookup`` to the ranking."""
+    sales = _daily_sales(**{f"order_id__{key}": value for key, value in lookup.items()})
+    if not sales:
+        return
+    def apply():
+        # a missing day is left alone and rebuilt when it is next read
+        for day, numbers in sales.items():
+            args = [value for name_number in numbers.items() for value in name_number]
+            increment_ranking(
+                keys=[_ranking_key(day), _version_key(day)],
+                args=[SALES_RANKING_TIMEOUT, *args],
+            )
+
+    transaction.on_commit(apply)
+
+
+def rebuild_rankings(days):
+    """
+    Recompute the rankings of ``days`` from the completed order details.
+
+    Each ranking is built under a temporary key and renamed into place, unless
+    an order completed that day in the meantime: its increment could be
+    missing from the rebuilt ranking or lost with the replaced one, so the day
+    is rebuilt again. Days still racing after ``REBUILD_ATTEMPTS`` are
+    dropped, to be rebuilt when next read.
+    """
+    connection = get_redis_connection("default")
+    days = list(days)
+    for _ in range(REBUILD_ATTEMPTS):
+        if not days:
+            return
+        versions = connection.mget([_version_key(day) for day in days])
+        sales = _daily_sales(order_id__order_time__date__in=days)
+        pipeline = connection.pipeline(transaction=False)
+        for day, version in zip(days, versions):
+            rebuilt_key = cache.make_key(f"sales_ranking_rebuild_{uuid4().hex}")
+            if day in sales:
+                pipeline.zadd(rebuilt_key, sales[day])
+                pipeline.expire(rebuilt_key, SALES_RANKING_TIMEOUT)
+            replace_ranking(
+                keys=[rebuilt_key, _ranking_key(day), _version_key(day)],
+                args=[version or b"0"],
+                client=pipeline,
+            )
+        replaced = pipeline.execute()[-len(days) :]
+        days = [day for day, done in zip(days, replaced) if not done]
+    if days:
+        connection.delete(*(_ranking_key(day) for day in days))
+
+
+def get_top_sales(begin, end, limit=10):
+    """
+    Return the ``limit`` best selling ``(name, number)`` pairs of the range.
+
+    Only days with completed orders have a ranking; any of them missing from
+    Redis is rebuilt first, then the day rankings are merged with ZUNIONSTORE.
+    """
+    days = list(
+        DailyRollup.objects.filter(
+            date__range=(begin, end), valid_order_count__gt=0
+        ).values_list("date", flat=True)
+    )
+    if not days:
+        return []
+
+    connection = get_redis_connection("default")
+    keys = [_ranking_key(day) for day in days]
+    pipeline = connection.pipeline(transaction=False)
+    for key in keys:
+        pipeline.exists(key)
+    missing = [day for day, exists in zip(days, pipeline.execute()) if not exists]
+    if missing:
+        rebuild_rankings(missing)
+
+    union_key = cache.make_key(f"sales_ranking_union_{uuid4().hex}")
+    pipeline = connection.pipeline()
+    pipeline.zunionstore(union_key, keys)
+    pipeline.zrevrange(union_key, 0, limit - 1, withscores=True)
+    pipeline.delete(union_key)
+    _, ranking, _ = pipeline.execute()
+    return [(name.decode(), int(number)) for name, number in ranking]
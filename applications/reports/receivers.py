@@ -0,0 +1,26 @@
+from django.db import transaction
+
+from applications.orders.transitions import COMPLETED
+
+from .rankings import add_completed_orders_to_ranking
+from .rollups import (
+    add_completed_orders_to_rollup,
+    add_customer_to_rollup,
+    add_order_to_rollup,
+)
+
+
+def order_created(sender, order, **kwargs):
+    # today's rollup row is shared by every checkout, lock it after commit
+    transaction.on_commit(lambda: add_order_to_rollup(order))
+
+
+def orders_transitioned(sender, target, lookup, **kwargs):
+    if target == COMPLETED:
+        transaction.on_commit(lambda: add_completed_orders_to_rollup(lookup))
+        add_completed_orders_to_ranking(lookup)
+
+
+def customer_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: add_customer_to_rollup(instance))
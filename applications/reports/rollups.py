@@ -0,0 +1,86 @@
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from applications.customers.models import WechatCostomer
+from applications.orders.models import Order
+
+from .models import DailyRollup
+
+ROLLUP_FIELDS = ["turnover", "order_count", "valid_order_count", "new_user_count"]
+
+
+def _increment(day, **deltas):
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if not DailyRollup.objects.filter(date=day).update(**updates):
+        DailyRollup.objects.get_or_create(date=day)
+        DailyRollup.objects.filter(date=day).update(**updates)
+
+
+def add_order_to_rollup(order):
+    _increment(timezone.localdate(order.order_time), order_count=1)
+
+
+def add_completed_orders_to_rollup(lookup):
+    """Count the completed orders matching ``lookup`` as valid orders."""
+    completed_orders = (
+        Order.objects.filter(status=5, **lookup)
+        .annotate(day=TruncDate("order_time"))
+        .values("day")
+        .annotate(count=Count("id"), turnover=Sum("amount"))
+    )
+    for row in completed_orders:
+        _increment(
+            row["day"], valid_order_count=row["count"], turnover=row["turnover"]
+        )
+
+
+def add_customer_to_rollup(customer):
+    _increment(timezone.localdate(customer.create_time), new_user_count=1)
+
+
+def rebuild_rollups(begin, end):
+    """Recompute the rollups of ``begin`` to ``end`` from the raw tables."""
+    rollups = {}
+
+    def rollup(day):
+        return rollups.setdefault(day, DailyRollup(date=day))
+
+    orders = (
+        Order.objects.filter(order_time__date__range=(begin, end))
+        .annotate(day=TruncDate("order_time"))
+        .values("day")
+        .annotate(count=Count("id"))
+    )
+    for row in orders:
+        rollup(row["day"]).order_count = row["count"]
+
+    completed_orders = (
+        Order.objects.filter(order_time__date__range=(begin, end), status=5)
+        .annotate(day=TruncDate("order_time"))
+        .values("day")
+        .annotate(count=Count("id"), turnover=Sum("amount"))
+    )
+    for row in completed_orders:
+        rollup(row["day"]).valid_order_count = row["count"]
+        rollup(row["day"]).turnover = row["turnover"]
+
+    customers = (
+        WechatCostomer.objects.filter(create_time__date__range=(begin, end))
+        .annotate(day=TruncDate("create_time"))
+        .values("day")
+        .annotate(count=Count("id"))
+    )
+    for row in customers:
+        rollup(row["day"]).new_user_count = row["count"]
+
+    DailyRollup.objects.filter(date__range=(begin, end)).exclude(
+        date__in=rollups.keys()
+    ).delete()
+    DailyRollup.objects.bulk_create(
+        rollups.values(),
+        update_conflicts=True,
+        unique_fields=["date"],
+        update_fields=ROLLUP_FIELDS,
+    )
+    return len(rollups)
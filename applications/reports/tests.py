@@ -0,0 +1,364 @@
+import csv
+import os
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django_redis import get_redis_connection
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from applications.customers.models import Address, WechatCostomer
+from applications.file_upload.models import UploadedImage
+from applications.meals.menu_cache import local_snapshots
+from applications.orders.models import Order, OrderDetail
+from applications.orders.transitions import transition_order
+
+from . import rankings
+from .exports import iter_export_rows
+from .models import DailyRollup
+from .views import (
+    BusinessDataView,
+    ExportBusinessDataView,
+    OrdersStatisticsView,
+    OverviewDishesView,
+    OverviewOrdersView,
+    OverviewSetmealsView,
+    Top10View,
+    TurnoverStatisticsView,
+    UserStatisticsView,
+)
+from .workspace import WORKSPACE_ORDERS_TIMEOUT
+
+# Create your tests here.
+
+
+def utc(*args):
+    return datetime(*args, 12, tzinfo=timezone.utc)
+
+
+class ReportViewTests(APITestCase):
+
+    def setUp(self):
+        self.admin_user = get_user_model().objects.create_user(
+            username="test_report",
+            password="testpass123",
+            name="test_report",
+            phone="12345678901",
+            sex="1",
+            id_number="123456789012345678",
+            status=1,
+        )
+        self.customer = WechatCostomer.objects.create(openid="test_report")
+        self.address = Address.objects.create(
+            customer_id=self.customer,
+            consignee="test_consignee",
+            phone="12345678901",
+            province_code="11",
+            province_name="北京市",
+            city_code="1101",
+            city_name="市辖区",
+            district_code="110101",
+            district_name="东城区",
+            detail="test_detail",
+        )
+        # 05-01: completed, 05-03: canceled and distributing
+        self.orders = [
+            self.create_order("report_1", 5, utc(2024, 5, 1)),
+            self.create_order("report_2", 6, utc(2024, 5, 3)),
+            self.create_order("report_3", 4, utc(2024, 5, 3)),
+        ]
+        WechatCostomer.objects.filter(id=self.customer.id).update(
+            create_time=utc(2024, 4, 30)
+        )
+        WechatCostomer.objects.create(openid="test_report_2")
+        WechatCostomer.objects.filter(openid="test_report_2").update(
+            create_time=utc(2024, 5, 2)
+        )
+        call_command(
+            "backfill_daily_rollups",
+            "--begin=2024-04-01",
+            "--end=2024-05-31",
+            stdout=StringIO(),
+        )
+        self.factory = APIRequestFactory()
+
+    def create_order(self, number, _status, order_time):
+        order = Order.objects.create(
+            number=number,
+            status=_status,
+            user_id=self.customer,
+            address_book_id=self.address,
+            pay_method=1,
+            amount=100,
+            delivery_status=1,
+            pack_amount=6,
+            tableware_number=1,
+            tableware_status=1,
+        )
+        Order.objects.filter(id=order.id).update(order_time=order_time)
+        return order
+
+    def get_report(self, view, name, begin="2024-05-01", end="2024-05-03", **params):
+        params.update(begin=begin, end=end)
+        request = self.factory.get(reverse(name), params)
+        force_authenticate(request, user=self.admin_user)
+        return view.as_view()(request)
+
+    def test_turnover_statistics(self):
+        with self.assertNumQueries(1):
+            response = self.get_report(TurnoverStatisticsView, "turnover_statistics")
+        self.assertEqual(
+            response.data["data"],
+            {
+                "dateList": "2024-05-01,2024-05-02,2024-05-03",
+                "turnoverList": "100.0,0.0,0.0",
+            },
+        )
+
+    def test_orders_statistics_follow_completion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_order("complete", {"id": self.orders[2].id})
+
+        data = self.get_report(OrdersStatisticsView, "orders_statistics").data["data"]
+        self.assertEqual(data["orderCountList"], "1,0,2")
+        self.assertEqual(data["validOrderCountList"], "1,0,1")
+        self.assertEqual(data["totalOrderCount"], 3)
+        self.assertEqual(data["validOrderCount"], 2)
+        self.assertAlmostEqual(data["orderCompletionRate"], 2 / 3)
+        self.assertEqual(DailyRollup.objects.get(date=date(2024, 5, 3)).turnover, 100)
+
+    def test_user_statistics(self):
+        data = self.get_report(UserStatisticsView, "user_statistics").data["data"]
+        self.assertEqual(data["newUserList"], "0,1,0")
+        self.assertEqual(data["totalUserList"], "1,2,2")
+
+    def test_invalid_date_range(self):
+        response = self.get_report(
+            TurnoverStatisticsView, "turnover_statistics", "2024-05-03", "2024-05-01"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_top10_merges_day_rankings(self):
+        image = UploadedImage.objects.create(file="images/test.png")
+        late_order = self.create_order("report_4", 4, utc(2024, 5, 1))
+        orders = [*self.orders, late_order]
+        numbers = ({"a": 1, "b": 3}, {"a": 9}, {"a": 4}, {"a": 5})
+        for order, order_numbers in zip(orders, numbers):
+            OrderDetail.objects.bulk_create(
+                OrderDetail(
+                    name=name, image=image, order_id=order, number=number, amount=10
+                )
+                for name, number in order_numbers.items()
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_order("complete", {"id": self.orders[2].id})
+        cache.clear()
+
+        # the missing day rankings are rebuilt from the completed orders
+        response = self.get_report(Top10View, "top10")
+        self.assertEqual(
+            response.data["data"], {"nameList": "a,b", "numberList": "5,3"}
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_order("complete", {"id": late_order.id})
+        # the completion is added to the cached ranking, only rollups are read
+        with self.assertNumQueries(1):
+            response = self.get_report(Top10View, "top10")
+        self.assertEqual(
+            response.data["data"], {"nameList": "a,b", "numberList": "10,3"}
+        )
+
+    def test_rebuild_keeps_completions_racing_with_it(self):
+        image = UploadedImage.objects.create(file="images/test.png")
+        late_order = self.create_order("report_4", 4, utc(2024, 5, 1))
+        OrderDetail.objects.bulk_create(
+            OrderDetail(name="a", image=image, order_id=order, number=number, amount=10)
+            for order, number in ((self.orders[0], 1), (late_order, 4))
+        )
+        day = date(2024, 5, 1)
+        rankings.rebuild_rankings([day])
+
+        daily_sales, raced = rankings._daily_sales, []
+
+        def complete_while_rebuilding(**lookup):
+            sales = daily_sales(**lookup)
+            if not raced:
+                raced.append(True)
+                with self.captureOnCommitCallbacks(execute=True):
+                    transition_order("complete", {"id": late_order.id})
+            return sales
+
+        with mock.patch.object(
+            rankings, "_daily_sales", side_effect=complete_while_rebuilding
+        ):
+            rankings.rebuild_rankings([day])
+
+        connection = get_redis_connection("default")
+        key = cache.make_key(f"sales_ranking_{day}")
+        self.assertEqual(connection.zscore(key, "a"), 5)
+        self.assertGreater(connection.ttl(key), 0)
+
+    def add_export_details(self):
+        image = UploadedImage.objects.create(file="images/test.png")
+        OrderDetail.objects.bulk_create(
+            OrderDetail(name=name, image=image, order_id=order, number=1, amount=10)
+            for order, name in zip(self.orders, ("a", "b", "c"))
+        )
+
+    def test_export_csv_streams_order_items(self):
+        self.add_export_details()
+        response = self.get_report(
+            ExportBusinessDataView, "export", "2024-05-03", "2024-05-03", fileType="csv"
+        )
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode().lstrip("\ufeff")
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0][:3], ["Order number", "Order time", "Status"])
+        self.assertEqual(
+            [row[:3] + row[6:9] for row in rows[1:]],
+            [
+                ["report_2", "2024-05-03 12:00:00", "canceled", "b", "1", "10.00"],
+                ["report_3", "2024-05-03 12:00:00", "distributing", "c", "1", "10.00"],
+            ],
+        )
+
+    def test_export_reads_rows_in_keyset_chunks(self):
+        self.add_export_details()
+        with mock.patch("applications.reports.exports.EXPORT_CHUNK_SIZE", 1):
+            # one query per row, then the empty chunk that ends the loop
+            with self.assertNumQueries(3) as queries:
+                rows = list(iter_export_rows(date(2024, 5, 3), date(2024, 5, 3)))
+        self.assertEqual([row[0] for row in rows[1:]], ["report_2", "report_3"])
+        self.assertIn("LIMIT 1", queries.captured_queries[0]["sql"])
+
+    def test_export_xlsx(self):
+        self.add_export_details()
+        response = self.get_report(ExportBusinessDataView, "export")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"PK"))
+
+        response = self.get_report(ExportBusinessDataView, "export", fileType="pdf")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_command_writes_to_media_root(self):
+        self.add_export_details()
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                call_command(
+                    "export_business_data",
+                    "--begin=2024-05-01",
+                    "--end=2024-05-01",
+                    "--file-type=csv",
+                    stdout=StringIO(),
+                )
+            path = os.path.join(
+                media_root, "reports", "business_data_2024-05-01_2024-05-01.csv"
+            )
+            with open(path, encoding="utf-8-sig") as file:
+                self.assertEqual(len(list(csv.reader(file))), 2)
+
+
+class WorkspaceViewTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        local_snapshots.clear()
+        self.admin_user = get_user_model().objects.create_user(
+            username="test_workspace",
+            password="testpass123",
+            name="test_workspace",
+            phone="12345678901",
+            sex="1",
+            id_number="123456789012345678",
+            status=1,
+        )
+        self.customer = WechatCostomer.objects.create(openid="test_workspace")
+        self.address = Address.objects.create(
+            customer_id=self.customer,
+            consignee="test_consignee",
+            phone="12345678901",
+            province_code="11",
+            province_name="北京市",
+            city_code="1101",
+            city_name="市辖区",
+            district_code="110101",
+            district_name="东城区",
+            detail="test_detail",
+        )
+        self.orders = [
+            Order.objects.create(
+                number=f"workspace_{_status}",
+                status=_status,
+                user_id=self.customer,
+                address_book_id=self.address,
+                pay_method=1,
+                amount=50,
+                delivery_status=1,
+                pack_amount=6,
+                tableware_number=1,
+                tableware_status=1,
+            )
+            for _status in (2, 4, 5, 6)
+        ]
+        self.factory = APIRequestFactory()
+
+    def get_workspace(self, view, name):
+        request = self.factory.get(reverse(name))
+        force_authenticate(request, user=self.admin_user)
+        return view.as_view()(request)
+
+    def test_business_data_is_cached_for_the_workspace_timeout(self):
+        with self.assertNumQueries(2):
+            response = self.get_workspace(BusinessDataView, "business_data")
+        self.assertEqual(
+            response.data["data"],
+            {
+                "turnover": 50.0,
+                "validOrderCount": 1,
+                "orderCompletionRate": 0.25,
+                "unitPrice": 50.0,
+                "newUsers": 1,
+            },
+        )
+        with self.assertNumQueries(0):
+            response = self.get_workspace(OverviewOrdersView, "overview_orders")
+        self.assertEqual(
+            response.data["data"],
+            {
+                "waitingOrders": 1,
+                "deliveredOrders": 0,
+                "completedOrders": 1,
+                "cancelledOrders": 1,
+                "allOrders": 4,
+            },
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_order("complete", {"id": self.orders[1].id})
+        # order writes leave the figures alone until they time out
+        with self.assertNumQueries(0):
+            response = self.get_workspace(BusinessDataView, "business_data")
+        self.assertEqual(response.data["data"]["turnover"], 50.0)
+
+        later = time.time() + WORKSPACE_ORDERS_TIMEOUT + 1
+        with mock.patch("applications.caching.time.time", return_value=later):
+            response = self.get_workspace(BusinessDataView, "business_data")
+        self.assertEqual(response.data["data"]["turnover"], 100.0)
+        self.assertEqual(response.data["data"]["validOrderCount"], 2)
+
+    def test_menu_overview(self):
+        with self.assertNumQueries(2):
+            response = self.get_workspace(OverviewDishesView, "overview_dishes")
+        self.assertEqual(response.data["data"], {"sold": 0, "discontinued": 0})
+        with self.assertNumQueries(0):
+            response = self.get_workspace(OverviewSetmealsView, "overview_setmeals")
+        self.assertEqual(response.data["data"], {"sold": 0, "discontinued": 0})
@@ -0,0 +1,45 @@
+from django.urls import path
+
+from .views import (
+    BusinessDataView,
+    ExportBusinessDataView,
+    OrdersStatisticsView,
+    OverviewDishesView,
+    OverviewOrdersView,
+    OverviewSetmealsView,
+    Top10View,
+    TurnoverStatisticsView,
+    UserStatisticsView,
+)
+
+urlpatterns = [
+    path(
+        "report/turnoverStatistics",
+        TurnoverStatisticsView.as_view(),
+        name="turnover_statistics",
+    ),
+    path("report/userStatistics", UserStatisticsView.as_view(), name="user_statistics"),
+    path(
+        "report/ordersStatistics",
+        OrdersStatisticsView.as_view(),
+        name="orders_statistics",
+    ),
+    path("report/top10", Top10View.as_view(), name="top10"),
+    path("report/export", ExportBusinessDataView.as_view(), name="export"),
+    path("workspace/businessData", BusinessDataView.as_view(), name="business_data"),
+    path(
+        "workspace/overviewOrders",
+        OverviewOrdersView.as_view(),
+        name="overview_orders",
+    ),
+    path(
+        "workspace/overviewDishes",
+        OverviewDishesView.as_view(),
+        name="overview_dishes",
+    ),
+    path(
+        "workspace/overviewSetmeals",
+        OverviewSetmealsView.as_view(),
+        name="overview_setmeals",
+    ),
+]
@@ -0,0 +1,235 @@
+import tempfile
+from datetime import date, timedelta
+
+from django.db.models import Sum
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+from applications.exceptions import (
+    InvalidDateRangeException,
+    InvalidFileTypeException,
+    KeyMissingException,
+)
+from applications.utils import standard_response
+
+from .exports import (
+    EXPORT_FILE_TYPES,
+    get_default_export_range,
+    get_export_filename,
+    iter_export_rows,
+    stream_csv,
+    write_xlsx,
+)
+from .models import DailyRollup
+from .rankings import get_top_sales
+from .workspace import get_menu_figures, get_today_figures
+
+
+def get_date_range(request):
+    dates = []
+    for key in ("begin", "end"):
+        value = request.query_params.get(key, None)
+        if not value:
+            raise KeyMissingException(key_name=key, position="query params")
+        try:
+            dates.append(date.fromisoformat(value))
+        except ValueError:
+            raise InvalidDateRangeException
+    begin, end = dates
+    if begin > end:
+        raise InvalidDateRangeException
+    return begin, end
+
+
+def get_daily_rollups(begin, end):
+    """Return one rollup per day of the range, reading only the range rows."""
+    rollups = {
+        rollup.date: rollup
+        for rollup in DailyRollup.objects.filter(date__range=(begin, end))
+    }
+    days = [begin + timedelta(days=n) for n in range((end - begin).days + 1)]
+    return [rollups.get(day, DailyRollup(date=day)) for day in days]
+
+
+def join(values):
+    return ",".join(str(value) for value in values)
+
+
+class TurnoverStatisticsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        rollups = get_daily_rollups(*get_date_range(request))
+        return standard_response(
+            True,
+            "Get turnover statistics successfully",
+            {
+                "dateList": join(rollup.date for rollup in rollups),
+                "turnoverList": join(float(rollup.turnover) for rollup in rollups),
+            },
+        )
+
+
+class UserStatisticsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        begin, end = get_date_range(request)
+        rollups = get_daily_rollups(begin, end)
+        total_user = (
+            DailyRollup.objects.filter(date__lt=begin).aggregate(
+                total=Sum("new_user_count")
+            )["total"]
+            or 0
+        )
+        total_user_list = []
+        for rollup in rollups:
+            total_user += rollup.new_user_count
+            total_user_list.append(total_user)
+
+        return standard_response(
+            True,
+            "Get user statistics successfully",
+            {
+                "dateList": join(rollup.date for rollup in rollups),
+                "newUserList": join(rollup.new_user_count for rollup in rollups),
+                "totalUserList": join(total_user_list),
+            },
+        )
+
+
+class OrdersStatisticsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        rollups = get_daily_rollups(*get_date_range(request))
+        total_order_count = sum(rollup.order_count for rollup in rollups)
+        valid_order_count = sum(rollup.valid_order_count for rollup in rollups)
+
+        return standard_response(
+            True,
+            "Get orders statistics successfully",
+            {
+                "dateList": join(rollup.date for rollup in rollups),
+                "orderCountList": join(rollup.order_count for rollup in rollups),
+                "validOrderCountList": join(
+                    rollup.valid_order_count for rollup in rollups
+                ),
+                "totalOrderCount": total_order_count,
+                "validOrderCount": valid_order_count,
+                "orderCompletionRate": (
+                    valid_order_count / total_order_count if total_order_count else 0.0
+                ),
+            },
+        )
+
+
+class Top10View(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        top_sales = get_top_sales(*get_date_range(request))
+        return standard_response(
+            True,
+            "Get top 10 successfully",
+            {
+                "nameList": join(name for name, _ in top_sales),
+                "numberList": join(number for _, number in top_sales),
+            },
+        )
+
+
+class ExportBusinessDataView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if "begin" in request.query_params or "end" in request.query_params:
+            begin, end = get_date_range(request)
+        else:
+            begin, end = get_default_export_range()
+        file_type = request.query_params.get("fileType", "xlsx")
+        if file_type not in EXPORT_FILE_TYPES:
+            raise InvalidFileTypeException
+        filename = get_export_filename(begin, end, file_type)
+        rows = iter_export_rows(begin, end)
+
+        if file_type == "csv":
+            response = StreamingHttpResponse(
+                stream_csv(rows), content_type=EXPORT_FILE_TYPES[file_type]
+            )
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+            return response
+
+        # an xlsx file is a zip that can only be finished once every row is
+        # written, so it is built on disk and then streamed in blocks
+        file = tempfile.TemporaryFile()
+        write_xlsx(rows, file)
+        file.seek(0)
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=filename,
+            content_type=EXPORT_FILE_TYPES[file_type],
+        )
+
+
+class BusinessDataView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        figures = get_today_figures()
+        turnover = figures["turnover"]
+        total_order_count = figures["all_orders"]
+        valid_order_count = figures["completed_orders"]
+        return standard_response(
+            True,
+            "Get business data successfully",
+            {
+                "turnover": turnover,
+                "validOrderCount": valid_order_count,
+                "orderCompletionRate": (
+                    valid_order_count / total_order_count if total_order_count else 0.0
+                ),
+                "unitPrice": (
+                    turnover / valid_order_count if valid_order_count else 0.0
+                ),
+                "newUsers": figures["new_users"],
+            },
+        )
+
+
+class OverviewOrdersView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        figures = get_today_figures()
+        return standard_response(
+            True,
+            "Get orders overview successfully",
+            {
+                "waitingOrders": figures["waiting_orders"],
+                "deliveredOrders": figures["delivered_orders"],
+                "completedOrders": figures["completed_orders"],
+                "cancelledOrders": figures["cancelled_orders"],
+                "allOrders": figures["all_orders"],
+            },
+        )
+
+
+class OverviewDishesView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return standard_response(
+            True, "Get dishes overview successfully", get_menu_figures()["dish"]
+        )
+
+
+class OverviewSetmealsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return standard_response(
+            True, "Get setmeals overview successfully", get_menu_figures()["setmeal"]
+        )
@@ -0,0 +1,65 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from applications.caching import get_or_compute
+from applications.customers.models import WechatCostomer
+from applications.meals.menu_cache import get_menu_snapshot
+from applications.meals.models import Dish, Setmeal
+from applications.orders.models import Order
+
+WORKSPACE_ORDERS_KEY = "workspace_orders_{day}"
+# every checkout and transition changes the figures, so rather than deleting
+# them on each write, they are served up to this many seconds old and then
+# recomputed by one worker while the others keep serving the stale copy
+WORKSPACE_ORDERS_TIMEOUT = 10
+
+
+def _today_range():
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today, time.min))
+    return today, start, start + timedelta(days=1)
+
+
+def compute_today_figures():
+    """Today's order figures in one conditional aggregate, plus the new users."""
+    _, start, stop = _today_range()
+    today_orders = Order.objects.filter(order_time__gte=start, order_time__lt=stop)
+    figures = today_orders.aggregate(
+        all_orders=Count("id"),
+        waiting_orders=Count("id", filter=Q(status=2)),
+        delivered_orders=Count("id", filter=Q(status=3)),
+        completed_orders=Count("id", filter=Q(status=5)),
+        cancelled_orders=Count("id", filter=Q(status=6)),
+        turnover=Sum("amount", filter=Q(status=5)),
+    )
+    figures["turnover"] = float(figures["turnover"] or 0)
+    figures["new_users"] = WechatCostomer.objects.filter(
+        create_time__gte=start, create_time__lt=stop
+    ).count()
+    return figures
+
+
+def compute_menu_figures():
+    return {
+        model.__name__.lower(): model.objects.aggregate(
+            sold=Count("id", filter=Q(status=1)),
+            discontinued=Count("id", filter=Q(status=0)),
+        )
+        for model in (Dish, Setmeal)
+    }
+
+
+def get_today_figures():
+    today, _, _ = _today_range()
+    return get_or_compute(
+        WORKSPACE_ORDERS_KEY.format(day=today),
+        compute_today_figures,
+        WORKSPACE_ORDERS_TIMEOUT,
+    )
+
+
+def get_menu_figures():
+    # menu writes bump the menu version, which retires the snapshot
+    return get_menu_snapshot("workspace_menu", compute_menu_figures)
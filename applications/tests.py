@@ -0,0 +1,124 @@
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from applications.customers.models import Address, WechatCostomer
+from applications.instrumentation import metrics
+from applications.meals.menu_cache import bump_menu_version, local_snapshots
+from applications.meals.models import Category
+from applications.orders.models import Order
+from applications.orders.transitions import transition_order
+
+# Create your tests here.
+
+
+@override_settings(REQUEST_METRICS_HEADERS=True, REQUEST_METRICS_SAMPLE_RATE=1.0)
+class RequestMetricsMiddlewareTests(APITestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="test_request_metrics",
+            password="testpass123",
+            name="test_request_metrics",
+            phone="12345678901",
+            sex="1",
+            id_number="123456789012345678",
+            status=1,
+        )
+        self.category = Category.objects.create(name="test_category", type=1, sort=1)
+        bump_menu_version()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("query_dish_by_category") + f"?categoryId={self.category.id}"
+        metrics.clear()
+
+    def tearDown(self):
+        local_snapshots.clear()
+        metrics.clear()
+
+    def test_queries_and_cache_lookups_are_recorded_per_url_name(self):
+        cold = self.client.get(self.url)
+        self.assertEqual(cold["X-Query-Count"], "1")
+        # the snapshot is looked up again once its build lock is held
+        self.assertEqual(cold["X-Cache-Misses"], "2")
+
+        local_snapshots.clear()
+        warm = self.client.get(self.url)
+        self.assertEqual(warm["X-Query-Count"], "0")
+        self.assertEqual(warm["X-Cache-Hits"], "2")
+        self.assertIn("X-Response-Time-Ms", warm)
+
+        view = '{view="query_dish_by_category"}'
+        series = metrics.collect()
+        self.assertEqual(series[f"http_request_duration_seconds_count{view}"], 2)
+        self.assertEqual(series[f"http_request_queries_sum{view}"], 1)
+        self.assertEqual(
+            series['cache_requests_total{group="menu_snapshot",result="hit"}'], 1
+        )
+
+        # every worker's series are served in the text exposition format
+        exposition = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn("# TYPE http_request_queries histogram", exposition)
+        self.assertIn(
+            'http_requests_total{view="query_dish_by_category",method="GET",'
+            'status="200"} 2.0',
+            exposition,
+        )
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_measured(self):
+        response = self.client.get(self.url)
+        self.assertNotIn("X-Query-Count", response)
+        self.assertNotIn(
+            '{view="query_dish_by_category"}', "".join(metrics.collect())
+        )
+
+    def test_metrics_are_only_served_to_internal_callers_and_staff(self):
+        outside = {"REMOTE_ADDR": "203.0.113.7"}
+        response = self.client.get(reverse("metrics"), **outside)
+        self.assertEqual(response.status_code, 403)
+
+        # the user is an employee, but not staff
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("metrics"), **outside)
+        self.assertEqual(response.status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("metrics"), **outside)
+        self.assertEqual(response.status_code, 200)
+
+    def test_order_transitions_are_counted_once_committed(self):
+        customer = WechatCostomer.objects.create(openid="test_request_metrics")
+        address = Address.objects.create(
+            customer_id=customer,
+            consignee="test_consignee",
+            phone="12345678901",
+            province_code="11",
+            province_name="北京市",
+            city_code="1101",
+            city_name="市辖区",
+            district_code="110101",
+            district_name="东城区",
+            detail="test_detail",
+        )
+        order = Order.objects.create(
+            number="test_request_metrics",
+            status=1,
+            user_id=customer,
+            address_book_id=address,
+            pay_method=1,
+            amount=50,
+            delivery_status=1,
+            pack_amount=6,
+            tableware_number=1,
+            tableware_status=1,
+        )
+        series = 'order_transitions_total{source="1",target="2"}'
+        with self.captureOnCommitCallbacks() as callbacks:
+            transition_order("pay", {"id": order.id})
+        self.assertNotIn(series, metrics.collect())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(metrics.collect()[series], 1)
@@ -1,8 +1,16 @@
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from functools import lru_cache
+
 from django.conf import settings
+from django.db.models import Q
 from rest_framework import status
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
+from applications.exceptions import InvalidCursorException
+
 
 def standard_response(success, msg, data={}, status_code=status.HTTP_200_OK):
     return Response(
@@ -15,11 +23,14 @@ def standard_response(success, msg, data={}, status_code=status.HTTP_200_OK):
     )
 
 
+# serializers convert the same few field names on every row
+@lru_cache(maxsize=1024)
 def to_camel_case(snake_str):
     components = snake_str.split("_")
     return components[0] + "".join(x.title() for x in components[1:])
 
 
+@lru_cache(maxsize=1024)
 def to_snake_case(camel_str):
     return "".join(["_" + i.lower() if i.isupper() else i for i in camel_str]).lstrip(
         "_"
@@ -40,6 +51,49 @@ def get_custom_pagination(page_size):
     return CustomPagination(page_size)
 
 
+class KeysetPagination:
+    """
+    Cursor pagination over ``(time_field, id)``, newest first.
+
+    Every page is an index range scan starting right after the previous one,
+    so page N costs the same as page 1. ``next_cursor`` is an opaque token
+    for the following page, or None on the last page.
+    """
+
+    cursor_query_param = "cursor"
+
+    def __init__(self, page_size, time_field):
+        self.page_size = min(int(page_size), settings.MAX_PAGE_SIZE)
+        self.time_field = time_field
+        self.next_cursor = None
+
+    def encode_cursor(self, instance):
+        raw = f"{getattr(instance, self.time_field).isoformat()}|{instance.id}"
+        return urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = urlsafe_b64decode(cursor.encode()).decode()
+            time_value, id_value = raw.split("|")
+            return datetime.fromisoformat(time_value), int(id_value)
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            raise InvalidCursorException
+
+    def paginate_queryset(self, queryset, request):
+        queryset = queryset.order_by(f"-{self.time_field}", "-id")
+        if cursor := request.query_params.get(self.cursor_query_param):
+            time_value, id_value = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f"{self.time_field}__lt": time_value})
+                | Q(**{self.time_field: time_value, "id__lt": id_value})
+            )
+        records = list(queryset[: self.page_size + 1])
+        if len(records) > self.page_size:
+            records = records[: self.page_size]
+            self.next_cursor = self.encode_cursor(records[-1])
+        return records
+
+
 def from_image_url_to_image_relative_path(image_path):
     media_url = settings.MEDIA_URL
     if image_path.startswith(media_url):
@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from applications.orders.events import order_events_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # the admin console listens on ws://<host>/ws/<client id>
+    if scope["type"] == "websocket" and scope["path"].startswith("/ws/"):
+        await order_events_websocket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,57 @@
+"""
+Self-contained settings for ``manage.py bench``.
+
+The benchmark runs against an in-memory SQLite database and an in-process
+fake Redis (``fakeredis`` with ``lupa`` for the Lua scripts), so it needs no
+outside services:
+
+    pip install -r requirements-bench.txt
+    DJANGO_SETTINGS_MODULE=django_project.bench_settings python manage.py bench
+"""
+
+import os
+
+for key in (
+    "SECRET_KEY",
+    "MYSQL_NAME",
+    "MYSQL_USER",
+    "MYSQL_PASSWORD",
+    "MYSQL_HOST",
+    "MYSQL_PORT",
+    "REDIS_HOST",
+    "WECHAT_APPID",
+    "WECHAT_SECRET_KEY",
+    "ROCKETMQ_NAME_SERVER",
+):
+    os.environ.setdefault(key, "bench")
+os.environ.setdefault("DJANGO_DEBUG", "False")
+
+import fakeredis  # noqa: E402
+
+from .settings import *  # noqa: E402, F401, F403
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://localhost:6379",
+        "OPTIONS": {
+            "CLIENT_CLASS": "applications.instrumentation.InstrumentedRedisClient",
+            "CONNECTION_POOL_KWARGS": {
+                "connection_class": fakeredis.FakeConnection,
+                "server": fakeredis.FakeServer(),
+            },
+        },
+    }
+}
+
+ALLOWED_HOSTS = ["testserver"]
+DELAYED_QUEUE_BACKEND = "applications.orders.delayed_jobs.InMemoryDelayedQueue"
+ORDER_EVENTS_BACKEND = "applications.orders.events.InMemoryEventBroker"
+REQUEST_METRICS_HEADERS = False
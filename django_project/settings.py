@@ -61,9 +61,11 @@ INSTALLED_APPS = [
     "applications.shop.apps.ShopConfig",
     "applications.customers.apps.CustomersConfig",
     "applications.orders.apps.OrdersConfig",
+    "applications.reports.apps.ReportsConfig",
 ]
 
 MIDDLEWARE = [
+    "applications.instrumentation.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -113,7 +115,7 @@ CACHES = {
         "BACKEND": "django_redis.cache.RedisCache",
         "LOCATION": f"redis://{env("REDIS_HOST")}:6379",
         "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CLIENT_CLASS": "applications.instrumentation.InstrumentedRedisClient",
         },
     }
 }
@@ -172,6 +174,10 @@ REST_FRAMEWORK = {
         "applications.customers.authentication.CustomJWTAuthentication"
     ],
     # 'EXCEPTION_HANDLER': 'applications.exception_handler.custom_exception_handler',
+    "DEFAULT_RENDERER_CLASSES": [
+        "applications.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
 }
@@ -239,8 +245,30 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# seconds an authenticated customer is cached in Redis and in each worker
+CUSTOMER_CACHE_TIMEOUT = 300
+CUSTOMER_LOCAL_CACHE_TIMEOUT = 5
+CUSTOMER_LOCAL_CACHE_SIZE = 4096
 
 WECHAT_APPID = env("WECHAT_APPID")
 WECHAT_SECRET_KEY = env("WECHAT_SECRET_KEY")
-
-ROCKETMQ_NAME_SERVER = env("ROCKETMQ_NAME_SERVER")
\ No newline at end of file
+WECHAT_API_URL = env("WECHAT_API_URL", default="https://api.weixin.qq.com")
+# (connect, read) seconds, so a slow WeChat cannot hold a worker for long
+WECHAT_API_TIMEOUT = (2, 5)
+WECHAT_API_RETRIES = 2
+# seconds a login code's openid is kept to absorb duplicate submits
+WECHAT_SESSION_CACHE_TIMEOUT = 60
+
+ROCKETMQ_NAME_SERVER = env("ROCKETMQ_NAME_SERVER")
+
+DELAYED_QUEUE_BACKEND = "applications.orders.delayed_jobs.RedisDelayedQueue"
+ORDER_PAYMENT_TIMEOUT = timedelta(minutes=10)
+ORDER_EVENTS_BACKEND = "applications.orders.events.RedisEventBroker"
+
+# share of requests measured by RequestMetricsMiddleware
+REQUEST_METRICS_SAMPLE_RATE = env.float("REQUEST_METRICS_SAMPLE_RATE", default=1.0)
+REQUEST_METRICS_HEADERS = env.bool("DJANGO_DEBUG", default=False)
+# seconds between pushes of each worker's metrics to Redis
+METRICS_FLUSH_INTERVAL = 10
+# addresses allowed to scrape /metrics, besides logged in staff
+METRICS_ALLOWED_IPS = env.list("METRICS_ALLOWED_IPS", default=["127.0.0.1", "::1"])
@@ -20,14 +20,18 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from applications.instrumentation import metrics_view
+
 urlpatterns = [
     path("django_admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path("dj-rest-auth/", include("dj_rest_auth.urls")),
     path("admin/", include("applications.employees.urls")),
     path("admin/", include("applications.file_upload.urls")),
     path("admin/", include("applications.meals.urls")),
     path("admin/", include("applications.shop.urls")),
     path("admin/", include("applications.orders.urls")),
+    path("admin/", include("applications.reports.urls")),
     path("user/", include("applications.shop.urls")),
     path("user/", include("applications.meals.urls")),
     path("user/", include("applications.customers.urls")),